@@ -1,68 +1,104 @@
-import json
 import random
-import shutil
 import time
 
 import psutil
+import requests
 from docker import client
 from docker import APIClient
+from docker.errors import NotFound
 
+from image import ImageCache
 from log import Log
+from topology import allocate, format_cpulist
 
 
+# container'ın cgroup'undaki en yüksek bellek kullanımı dosyaları (cgroup v2 ve v1,
+# systemd ve cgroupfs sürücüleri). docker stats'ın max_usage değeri cgroup v2'de yoktur.
+CGROUP_MEMORY_PEAK = (
+    '/sys/fs/cgroup/system.slice/docker-%s.scope/memory.peak',
+    '/sys/fs/cgroup/docker/%s/memory.peak',
+    '/sys/fs/cgroup/memory/system.slice/docker-%s.scope/memory.max_usage_in_bytes',
+    '/sys/fs/cgroup/memory/docker/%s/memory.max_usage_in_bytes',
+)
+
 class Docker:
+    # docker istemcisini üreten sınıf; ölçümlerde docker olmadan çalışmak için sahte bir istemci verilebilir.
+    client_factory = APIClient
+
     def __init__(self, parameters=None):
         self.log = Log()
         self.name = None
         self.memory_limit = self.set_memory_limit(parameters.memory_limit)
+        self.memswap_limit = None
         self.binds = {}
         self.volumes = []
+        self.tmpfs = {}
         self.package_name = None
         self.image = None
         self.cpu_set = self.set_cpu_set(parameters.cpu_set)
+        self.cpus = None
+        self.cpu_share = None
+        self.cpuset_cpus = None
+        self.cpuset_mems = None
+        self.set_cpu_allocation(*allocate(self.cpu_set, 1)[0])
         self.command = None
         self.my_client = None
         self.host_config = None
         self.my_container = None
-        self.tmp_status = False
+        self.container_id = None
+        self.exit_code = None
+        self.finished_at = None
+        self.oom_killed = False
+        # docker wait'in zaman aşımı dışındaki art arda hata sayısı.
+        self.wait_errors = 0
+        self.pull_image = True
+        self.stage_times = {}
+        self.image_ttl = parameters.image_ttl
 
     def start(self):
         # containerımızı parametreleri ile çalıştıracağımız fonksiyonumuz.
-        if not self.my_client:
-            # my_client'de çalışan docker process'ini yakalıyorum.
-            self.my_client = APIClient(base_url='unix://var/run/docker.sock', version='1.35')
+        self.get_client()
 
         # container'ımızın host configlerini yapalım.
-        self.host_config = self.my_client.create_host_config(mem_limit='%sM' % self.memory_limit, binds=self.binds, security_opt=['seccomp:unconfined'])
+        self.host_config = self.my_client.create_host_config(mem_limit='%sM' % self.memory_limit,
+                                                       memswap_limit='%sM' % self.memswap_limit if self.memswap_limit
+                                                       else None, binds=self.binds,
+                                                       tmpfs=self.tmpfs or None, cpuset_cpus=self.cpuset_cpus,
+                                                       cpuset_mems=self.cpuset_mems,
+                                                       nano_cpus=int(self.cpu_share * 1e9) if self.cpu_share else None,
+                                                       security_opt=['seccomp:unconfined'])
         # hadi şimdi aynı isimle bir containerımız var mı görelim.
         self.control_docker()
-        # kullanılacak imaj son sürüme yükseltelim
-        self.tmp_status = False
-        message = '%s imajı güncelleniyor' % self.image
-        for line in self.my_client.pull(self.image, stream=True):
-            line = json.loads(line.decode('UTF-8'))
-            if line['status'] == 'Downloading':
-                if self.tmp_status is False:
-                    self.log.information(message=message)
-                    self.tmp_status = True
-                print('  %s' % line['progress'], end='\r')
-
-        if self.tmp_status is True:
-            print('')
-            self.log.information(message='İmaj son sürüme güncellendi')
+        # kullanılacak imaj güncel değilse son sürüme yükseltelim (yerel ısıtılmış imajlar çekilmez)
+        started = time.time()
+        if self.pull_image:
+            ImageCache(self.my_client, self.image_ttl).ensure(self.image)
+        self.stage_times['pull'] = self.stage_times.get('pull', 0) + time.time() - started
 
         # my_container ile konteynırımızı oluşturuyoruz ve onda saklıyoruz.
+        started = time.time()
         try:
             self.my_container = self.my_client.create_container(image=self.image, command=self.command, name=self.name,
                                                                 volumes=self.volumes,
                                                                 host_config=self.host_config)
+            # bitişi beklerken isim listesini taramak yerine container ID'sini kullanacağız.
+            self.container_id = self.my_container['Id']
+            self.exit_code = None
+            self.finished_at = None
             # ve konteynırımızı çalıştırmaya başlıyoruz.
             self.my_client.start(self.name)
+            self.stage_times['container_create'] = time.time() - started
         except Exception as e:
             self.log.error('Container oluşturma/başlatma hatası: %s' % str(e))
             self.log.error('Container adı: %s, Image: %s, Command: %s' % (self.name, self.image, self.command))
             raise
 
+    def get_client(self):
+        if not self.my_client:
+            # my_client'de çalışan docker process'ini yakalıyorum.
+            self.my_client = self.client_factory(base_url='unix://var/run/docker.sock', version='1.35')
+        return self.my_client
+
     def pause(self):
         # containerımızı durdurmak için çalıştıracağımız fonksiyonumuz.
         self.my_client.pause(self.name)
@@ -77,18 +113,40 @@ class Docker:
 
     def remove(self):
         # containerımızı silecek fonksiyonumuz
-        state = self.my_client.inspect_container(self.name)
-        state = state['State']['Running']
-        if state is True:
-            self.my_client.stop(self.name)
-        self.my_client.remove_container(self.name)
+        try:
+            state = self.my_client.inspect_container(self.container_id or self.name)
+            state = state['State']['Running']
+            if state is True:
+                self.my_client.stop(self.container_id or self.name)
+            self.my_client.remove_container(self.container_id or self.name)
+        except NotFound:
+            # container zaten yok (ör: yeniden başlatmadan önce silinmiş).
+            pass
         self.volumes = []
         self.binds = {}
+        self.tmpfs = {}
         self.name = None
-        if self.package_name is not None:
-            shutil.rmtree('/tmp/gonullu/%s' % self.package_name, ignore_errors=True)
-            shutil.rmtree('/tmp/varpisi/%s' % self.package_name, ignore_errors=True)
-            self.package_name = None
+        self.container_id = None
+        self.package_name = None
+
+    def stats(self):
+        # container'ın anlık işlemci, bellek ve disk kullanımı (docker stats API).
+        try:
+            return self.my_client.stats(self.container_id or self.name, stream=False)
+        except Exception:
+            return None
+
+    def memory_peak(self):
+        # container başladığından beri en yüksek bellek kullanımı (byte), okunamazsa 0.
+        if not self.container_id:
+            return 0
+        for pattern in CGROUP_MEMORY_PEAK:
+            try:
+                with open(pattern % self.container_id, 'r') as f:
+                    return int(f.read())
+            except (OSError, ValueError):
+                continue
+        return 0
 
     def get_logs(self):
         # burada oluşan log çıktılarımızı yakalayacağız.
@@ -117,6 +175,11 @@ class Docker:
         
         self.log.information('Container adı oluşturuldu: %s' % self.name)
 
+    def set_memory(self, memory_limit, memswap_limit=None):
+        # bu derleme için bellek ve bellek+takas sınırını (MB) atadığımız fonksiyonumuz.
+        self.memory_limit = memory_limit
+        self.memswap_limit = memswap_limit
+
     @staticmethod
     def set_memory_limit(memory_limit):
         # ram limitimizi atadığımız fonksiyonumuz.
@@ -131,22 +194,88 @@ class Docker:
         # atayacağımız cpularımızı atadığımız fonksiyonumuz.
         return int(cpu_set)
 
+    def set_cpu_allocation(self, cpus, mems, share):
+        # container'ın çalışacağı işlemcileri, NUMA bellek düğümlerini ve işlemci payını atadığımız fonksiyonumuz.
+        # işlemci payı kümedeki işlemci sayısından azsa (ör: yuvalar küme paylaşıyorsa) kota uygulanır.
+        self.cpus = cpus
+        self.cpuset_cpus = format_cpulist(cpus)
+        self.cpuset_mems = ','.join(str(mem) for mem in mems) if len(mems) > 0 else None
+        self.cpu_share = share if share < len(cpus) else None
+
     def add_volume(self, local, indocker):
         # bölüm ekleyeceğimiz fonksiyonumuz.
         self.volumes.append(indocker)
         self.binds[local] = {'bind': indocker, 'mode': 'rw'}
 
+    def add_tmpfs(self, indocker, options=''):
+        # container içinde bellekte tutulan bir bölüm ekleyeceğimiz fonksiyonumuz.
+        self.tmpfs[indocker] = options
+
     def set_command(self, application, queue_id, commit_id, package):
         # çalıştıracağımız komutu atadığımız fonksiyonumuz.
         self.command = '%s %s %s %s' % (application, queue_id, commit_id, package)
 
     def check(self):
         # derleme işlemi devam ediyor mu kontrol edelim
-        for container in self.my_client.containers():
-            if container['Names'][0].replace('/', '') == self.name:
-                return 0
-        else:
+        try:
+            state = self.my_client.inspect_container(self.container_id or self.name)['State']
+        except NotFound:
             return 1
+        if state['Running']:
+            return 0
+        return 1
+
+    def wait_container(self, timeout=None):
+        # container durana kadar docker'ın wait çağrısı ile bloklanarak bekleriz.
+        # timeout dolarsa None, container durduysa çıkış kodunu döneriz. NotFound da bir
+        # RequestException olduğu için önce yakalanmalı.
+        try:
+            result = self.my_client.wait(self.container_id or self.name, timeout=timeout)
+        except NotFound:
+            result = {'StatusCode': -1}
+        except requests.exceptions.RequestException as e:
+            if self.wait_timed_out(e):
+                self.wait_errors = 0
+                return None
+            # docker'a erişilemiyor; çağıranın döngüsü boşa dönmesin diye artan sürelerle bekliyoruz.
+            self.wait_errors += 1
+            delay = min(30, 2 ** min(self.wait_errors, 5))
+            self.log.warning('%s container\'ı beklenirken hata oluştu, %d saniye sonra tekrar denenecek: %s' %
+                             (self.name, delay, str(e)))
+            time.sleep(delay)
+            return None
+
+        self.wait_errors = 0
+        self.exit_code = result['StatusCode'] if isinstance(result, dict) else int(result)
+        self.finished_at = time.time()
+        try:
+            self.oom_killed = self.my_client.inspect_container(self.container_id or self.name)['State']['OOMKilled']
+        except (NotFound, KeyError):
+            self.oom_killed = False
+        return self.exit_code
+
+    @staticmethod
+    def wait_timed_out(error):
+        # docker wait'in süresi dolduğunda requests ReadTimeout, unix soketi üzerinden ise
+        # "Read timed out" içeren bir ConnectionError fırlatır.
+        if isinstance(error, requests.exceptions.ReadTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return False
+        return isinstance(error, requests.exceptions.ConnectionError) and 'read timed out' in str(error).lower()
+
+    def attach(self, container_id, name):
+        # başka bir süreçte başlatılmış container'a yeniden bağlanır, container yoksa False döner.
+        self.get_client()
+        self.container_id = container_id
+        self.name = name
+        self.exit_code = None
+        self.finished_at = None
+        try:
+            self.my_client.inspect_container(container_id or name)
+        except NotFound:
+            return False
+        return True
 
     def control_docker(self):
         # oluşacak paketin adı ile önceden docker kaydı var mı kontrol edelim.
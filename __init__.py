@@ -2,6 +2,8 @@ from .farm import Farm
 from .Gdocker import Docker
 from .volunteer import Volunteer
 from .log import Log
+from .worker import Worker
+from .scheduler import Scheduler
 
 __version__ = "1.0.0"
 __author__ = "PisiLinux Community"
@@ -0,0 +1,80 @@
+import threading
+
+import psutil
+
+from history import history as build_history
+from log import Log
+
+
+class MemoryAdmission:
+    # derlemelerin bellek sınırını paketin geçmişteki en yüksek bellek kullanımından
+    # hesaplayan ve toplam ayrılan bellek bütçeyi aşacaksa yeni derlemeyi bekleten
+    # denetleyicimiz. Tüm yuvalar aynı nesneyi paylaşır.
+    def __init__(self, memory_limit, slots=1, margin=1.5, minimum=512, swap_ratio=1.5, history=None):
+        # memory_limit: fiziksel belleğin derlemelere ayrılacak yüzdesi.
+        self.budget = int(psutil.virtual_memory().total * (memory_limit / 100)) >> 20
+        self.default = max(minimum, self.budget // max(1, slots))
+        self.margin = margin
+        self.minimum = minimum
+        self.swap_ratio = swap_ratio
+        self.reserved = {}
+        self.condition = threading.Condition()
+        self.log = Log()
+        # paketlerin geçmişteki bellek kullanımları derleme geçmişi veritabanından okunur.
+        self.history = history if history is not None else build_history
+
+    def limit_for(self, package):
+        # paketin bellek sınırı (MB). Geçmişi olmayan paketler eski sabit payı alır.
+        prediction = self.history.predict(package)
+        if not prediction or not prediction['peak_memory']:
+            return self.default
+        limit = int((prediction['peak_memory'] >> 20) * self.margin)
+        if prediction['oom_killed']:
+            # son derleme bellek yetmediği için öldürüldüyse sınırı iki katına çıkarıyoruz.
+            limit = max(limit, (prediction['memory_limit'] or self.default) * 2)
+        return max(self.minimum, min(self.budget, limit))
+
+    def headroom(self):
+        # yeni iş istemeden önce bütçede boş olması gereken bellek (MB): son derlemelerin
+        # tipik en yüksek kullanımı, geçmiş yoksa yuva başına düşen pay.
+        peak = self.history.typical_peak()
+        if not peak:
+            return self.default
+        return max(self.minimum, min(self.budget, int((peak >> 20) * self.margin)))
+
+    def wait_headroom(self, timeout):
+        # bütçede tipik bir derlemeye yetecek yer varsa True döner, yoksa en fazla timeout
+        # saniye bekler. Böylece çiftlikten alınan paket burada bellek beklerken bekletilmez.
+        need = self.headroom()
+        with self.condition:
+            if self.reserved and self.budget - sum(self.reserved.values()) < need:
+                self.condition.wait(timeout)
+            return not self.reserved or self.budget - sum(self.reserved.values()) >= need
+
+    def swap_for(self, limit):
+        return int(limit * self.swap_ratio)
+
+    def acquire(self, key, package, extra=0):
+        # bütçede yer açılana kadar bekler ve ayrılan sınırı döner. Hiç derleme
+        # çalışmıyorsa büyük paketler de aç kalmasın diye her zaman kabul edilir.
+        # extra: derlemenin dışında container'ın belleğinden sayılan kısım (ör: tmpfs, MB).
+        limit = self.limit_for(package) + extra
+        with self.condition:
+            waiting = False
+            while self.reserved and sum(self.reserved.values()) + limit > self.budget:
+                if not waiting:
+                    self.log.information('%s paketi için %d MB bellek bekleniyor.' % (package, limit))
+                    waiting = True
+                self.condition.wait()
+            self.reserved[key] = limit
+        return limit
+
+    def reserve(self, key, limit):
+        # zaten çalışan bir derlemenin (ör: yeniden bağlanılan container) belleğini beklemeden ayırır.
+        with self.condition:
+            self.reserved[key] = limit
+
+    def release(self, key):
+        with self.condition:
+            self.reserved.pop(key, None)
+            self.condition.notify_all()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from admission import MemoryAdmission
+import cache
+import config
+import delta
+from cache import PackageCache
+from farm import Farm
+from fakedocker import FakeDockerClient
+from Gdocker import Docker
+from history import history
+from journal import journal
+from log import Log
+from metrics import BuildMetrics, metrics
+from mockfarm import MockFarm
+from scheduler import Scheduler
+from volunteer import Volunteer
+from worker import Worker
+
+
+# karşılaştırmada büyük ya da küçük olanın iyi olduğu ölçümler.
+HIGHER_IS_BETTER = ('packages_per_hour', 'upload_throughput')
+LOWER_IS_BETTER = ('wall_seconds', 'pickup_seconds', 'loop_overhead_seconds', 'downloads', 'download_seconds')
+
+
+def usage():
+    print("""
+Gonullu istemcisini yerel sahte ciftlik ve sahte docker ile olcer.
+Paket basina saatlik paket sayisi, paketin alinma gecikmesi, gonderim hizi
+ve derleme disindaki dongu yukunu raporlar.
+Asagidaki satir, 2 saniye suren 20 paketi 2 yuvada derler ve sonucu kaydeder.
+\tsudo python3 benchmark.py --packages=20 --build-time=2 --slots=2 --output=yeni.json
+Asagidaki satir, ayni olcumu onceki bir sonuc ile karsilastirir.
+\tsudo python3 benchmark.py --packages=20 --build-time=2 --slots=2 --compare=eski.json
+Asagidaki satir, 5 farkli paketi tekrar tekrar derleyerek kaynak arsivi
+onbellegine gore is secmenin indirme suresine etkisini olcer.
+\tsudo python3 benchmark.py --packages=20 --distinct=5 --download-time=3 --arrival=1
+Asagidaki satir, paketlerin yarisinin bagimlilik hatasi ile basarisiz oldugu
+durumda yuvalarin ne kadar cabuk bosaldigini olcer.
+\tsudo python3 benchmark.py --packages=20 --failure-rate=0.5 --failure-kind=dependency
+Asagidaki satir, 5 paketin .pisi dosyalarinin her derlemede %5'i degistiginde
+fark gonderiminin gonderilen veri miktarina etkisini olcer.
+\tsudo python3 benchmark.py --packages=20 --distinct=5 --artifact-change=0.05 --delta-upload
+""")
+    sys.exit()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def distribution(values):
+    return {'mean': sum(values) / len(values) if values else 0.0,
+            'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95), 'max': max(values) if values else 0.0}
+
+
+def summarize(farm, wall, args):
+    # çiftliğin tuttuğu zamanlar ile sahte docker'ın derleme sürelerinden sonuçları hesaplar.
+    jobs = [job for job in farm.stats()['jobs'] if job['completed'] is not None]
+    pickup = [job['issued'] - job['released'] for job in jobs]
+    overhead = []
+    for job in jobs:
+        run = FakeDockerClient.runs.get(job['package'])
+        if run is not None:
+            overhead.append((job['completed'] - job['issued']) - (run[1] - run[0]))
+
+    upload_bytes = metrics.counters.get(metrics.key('gonullu_upload_bytes_total', {}), 0)
+    upload_seconds = metrics.summaries.get(metrics.key('gonullu_upload_seconds', {}), (0, 0))[0]
+    return {
+        'config': vars(args),
+        'completed': len(jobs),
+        'failed': sum(1 for job in jobs if job['state'] != 0),
+        'wall_seconds': wall,
+        'packages_per_hour': len(jobs) * 3600 / wall if wall else 0.0,
+        'pickup_seconds': distribution(pickup),
+        'loop_overhead_seconds': distribution(overhead),
+        'warm_builds': sum(1 for job in jobs if job['warm']),
+        'downloads': len(FakeDockerClient.downloads),
+        'download_seconds': len(FakeDockerClient.downloads) * FakeDockerClient.download_time,
+        'upload_bytes': upload_bytes,
+        'upload_throughput': upload_bytes / upload_seconds if upload_seconds else 0.0,
+    }
+
+
+def flatten(result):
+    values = {}
+    for key, value in result.items():
+        if key == 'config':
+            continue
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                values['%s.%s' % (key, sub_key)] = sub_value
+        else:
+            values[key] = value
+    return values
+
+
+def report(result, previous=None):
+    current = flatten(result)
+    old = flatten(previous) if previous else {}
+    print('')
+    for key, value in current.items():
+        line = '%-32s %14.3f' % (key, value)
+        if key in old:
+            change = (value - old[key]) / old[key] * 100 if old[key] else 0.0
+            better = None
+            if change and key.startswith(HIGHER_IS_BETTER + LOWER_IS_BETTER):
+                better = (change > 0) == key.startswith(HIGHER_IS_BETTER)
+            line += '  (önceki: %.3f, %+.1f%%%s)' % (old[key], change,
+                                                    '' if better is None else ' iyi' if better else ' kötü')
+        print(line)
+    print('')
+
+
+def run(args, log):
+    FakeDockerClient.reset()
+    FakeDockerClient.configure(build_time=args.build_time, jitter=args.jitter, artifacts=args.artifacts,
+                               artifact_size=int(args.artifact_size * (1 << 20)), artifact_change=args.artifact_change,
+                               log_size=int(args.log_size * (1 << 20)), failure_rate=args.failure_rate,
+                               failure_kind=args.failure_kind,
+                               download_time=args.download_time)
+    Docker.client_factory = FakeDockerClient
+    # ölçümdeki işler gerçek iş günlüğüne, derleme geçmişine, pisi önbelleğine ve kayıtlı mail
+    # adresine karışmasın, her ölçüm soğuk başlasın.
+    state = tempfile.mkdtemp(prefix='gonullu-benchmark-')
+    journal.directory = os.path.join(state, 'journal')
+    cache.SHARED_ROOT = os.path.join(state, 'pisi')
+    cache.WORK_ROOT = os.path.join(state, 'work')
+    cache.INDEX_FILE = os.path.join(state, 'pisi-cache.json')
+    cache.LOCK_FILE = os.path.join(state, 'pisi-cache.lock')
+    cache.CCACHE_ROOT = os.path.join(state, 'ccache')
+    PackageCache.warm = None
+    history.path = os.path.join(state, 'history.sqlite')
+    history.connection = None
+    delta.records.directory = os.path.join(state, 'delta')
+    BuildMetrics.directory = os.path.join(state, 'builds')
+    config.MAIL_CONFIG.path = os.path.join(state, 'mail_config.yml')
+    config.MAIL_CONFIG.checked = 0
+
+    mock = MockFarm(args.packages, arrival=args.arrival, long_poll=not args.no_long_poll, distinct=args.distinct,
+                    affinity=not args.no_affinity).start()
+    farm = Farm(mock.url, 'benchmark@localhost', upload_workers=args.upload_workers,
+                pool_size=args.upload_workers * args.slots + args.slots,
+                log_compression=None if args.log_compression == 'none' else args.log_compression,
+                delta_uploads=args.delta_upload)
+    farm.time = 1
+    farm.advertise = lambda: {'X-Gonullu-Warm': ','.join(PackageCache.warm_packages())}
+
+    if args.slots > 1:
+        runner = Scheduler(args, farm, log)
+        for slot in runner.slots:
+            slot.worker.farm.time = farm.time
+        target = runner.run
+    else:
+        runner = Worker(Volunteer(args), farm, log, Volunteer(args) if args.pipeline else None,
+                        MemoryAdmission(args.memory_limit))
+        target = runner.run
+
+    started = time.time()
+    thread = threading.Thread(target=target, name='gonullu-benchmark', daemon=True)
+    thread.start()
+    finished = mock.wait_finished(args.timeout)
+    wall = time.time() - started
+    runner.stop()
+    mock.close()
+    thread.join(args.timeout)
+    if not finished:
+        log.warning('Ölçüm %d saniyede tamamlanamadı, biten paketler raporlanıyor.' % args.timeout)
+    return summarize(mock, wall, args)
+
+
+if __name__ == '__main__':
+    log = Log()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--packages', action='store', dest='packages', default=20, type=int)
+    parser.add_argument('-b', '--build-time', action='store', dest='build_time', default=2.0, type=float)
+    parser.add_argument('--jitter', action='store', dest='jitter', default=0.0, type=float)
+    parser.add_argument('--arrival', action='store', dest='arrival', default=0.0, type=float)
+    parser.add_argument('--artifacts', action='store', dest='artifacts', default=2, type=int)
+    parser.add_argument('--artifact-size', action='store', dest='artifact_size', default=4, type=float)
+    parser.add_argument('--artifact-change', action='store', dest='artifact_change', default=1.0, type=float)
+    parser.add_argument('--log-size', action='store', dest='log_size', default=1, type=float)
+    parser.add_argument('--failure-rate', action='store', dest='failure_rate', default=0.0, type=float)
+    parser.add_argument('--failure-kind', action='store', dest='failure_kind', default='compile',
+                        choices=['setup', 'dependency', 'compile', 'oom'])
+    parser.add_argument('--distinct', action='store', dest='distinct', default=0, type=int)
+    parser.add_argument('--download-time', action='store', dest='download_time', default=0.0, type=float)
+    parser.add_argument('--no-affinity', action='store_true', dest='no_affinity', default=False)
+    parser.add_argument('--no-long-poll', action='store_true', dest='no_long_poll', default=False)
+    parser.add_argument('-s', '--slots', action='store', dest='slots', default=1, type=int)
+    parser.add_argument('-p', '--pipeline', action='store_true', dest='pipeline', default=False)
+    parser.add_argument('-w', '--warm', action='store_true', dest='warm', default=False)
+    parser.add_argument('-m', '--memory', action='store', dest='memory_limit', default=50, type=int)
+    parser.add_argument('-c', '--cpu', action='store', dest='cpu_set', default=100, type=int)
+    parser.add_argument('-j', '--job', action='store', dest='job', default=None, type=int)
+    parser.add_argument('-u', '--upload-workers', action='store', dest='upload_workers', default=4, type=int)
+    parser.add_argument('--log-compression', action='store', dest='log_compression', default='none',
+                        choices=['none', 'gzip', 'zstd'])
+    parser.add_argument('--delta-upload', action='store_true', dest='delta_upload', default=False)
+    parser.add_argument('--cache-size', action='store', dest='cache_size', default=20480, type=int)
+    parser.add_argument('--ccache', action='store', dest='ccache', default=None, type=str)
+    parser.add_argument('--ccache-total', action='store', dest='ccache_total', default=0, type=int)
+    parser.add_argument('--workspace', action='store', dest='workspace', default='dir', choices=['dir', 'tmpfs'])
+    parser.add_argument('--scratch', action='store', dest='scratch', default='/tmp/varpisi', type=str)
+    parser.add_argument('--tmpfs-size', action='store', dest='tmpfs_size', default=4096, type=int)
+    parser.add_argument('--image-ttl', action='store', dest='image_ttl', default=3600, type=int)
+    parser.add_argument('--timeout', action='store', dest='timeout', default=3600, type=int)
+    parser.add_argument('-o', '--output', action='store', dest='output', default=None, type=str)
+    parser.add_argument('--compare', action='store', dest='compare', default=None, type=str)
+    parser.add_argument('--usage', action='store_true', dest='usage', default=False)
+    args = parser.parse_args()
+
+    if args.usage:
+        usage()
+
+    if os.getuid() != 0:
+        log.error('Lütfen programı yönetici(sudo) olarak çalıştırınız.')
+        log.get_exit()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+
+    result = run(args, log)
+    report(result, previous)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        log.success('Sonuçlar %s dosyasına yazıldı.' % args.output)
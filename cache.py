@@ -0,0 +1,372 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from log import Log
+
+
+# pisi'nin paket ve kaynak arşivi önbelleği, tüm derlemeler arasında ortak.
+SHARED_ROOT = '/var/cache/pisi'
+# her derlemeye özel, ortak önbelleğe sabit bağlantılarla (hardlink) bağlı çalışma dizinleri.
+WORK_ROOT = '/var/cache/gonullu/work'
+INDEX_FILE = '/var/cache/gonullu/pisi-cache.json'
+LOCK_FILE = '/var/cache/gonullu/pisi-cache.lock'
+SUBDIRS = ('packages', 'archives')
+# paket başına derleyici önbelleği (ccache) dizinleri.
+CCACHE_ROOT = '/var/cache/gonullu/ccache'
+
+
+class PackageCache:
+    # /var/cache/pisi/{packages,archives} dizinlerini boyut sınırı, LRU temizliği ve
+    # kaynak arşivlerinde içerik özeti ile tekilleştirme yaparak yöneten sınıfımız.
+    # Her container kendi çalışma dizinine yazar; böylece aynı anda çalışan derlemeler
+    # birbirinin yarım kalmış indirmelerini görmez.
+    lock = threading.Lock()
+    # önbellekteki dosyaları hâlâ yerinde olan paketler (en son kullanılan önde); iş isterken bildirilir.
+    warm = None
+
+    def __init__(self, size_limit=20480):
+        # size_limit: MB cinsinden üst sınır, 0 ise sınırsız.
+        self.size_limit = size_limit << 20
+        self.log = Log()
+        self.checkouts = {}
+
+    def checkout(self, name):
+        # ortak önbelleği derlemeye özel bir dizine hardlink'ler ile kopyalar.
+        with self.locked():
+            return self._checkout(name)
+
+    def _checkout(self, name):
+        work = os.path.join(WORK_ROOT, name)
+        paths = {}
+        for subdir in SUBDIRS:
+            shared = os.path.join(SHARED_ROOT, subdir)
+            private = os.path.join(work, subdir)
+            os.makedirs(shared, exist_ok=True)
+            os.makedirs(private, exist_ok=True)
+            for entry in os.scandir(shared):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    os.link(entry.path, os.path.join(private, entry.name))
+                except FileExistsError:
+                    pass
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # farklı dosya sistemleri: hardlink olmuyorsa ortak dizini doğrudan kullanırız.
+                    self.log.warning('%s ile %s aynı dosya sisteminde değil, önbellek paylaşımlı kullanılacak.' %
+                                     (SHARED_ROOT, WORK_ROOT))
+                    shutil.rmtree(work, ignore_errors=True)
+                    return {subdir: os.path.join(SHARED_ROOT, subdir) for subdir in SUBDIRS}
+            paths[subdir] = private
+        self.checkouts[name] = time.time()
+        return paths
+
+    def checkin(self, name, package=None):
+        # derleme sırasında inen yeni dosyaları ortak önbelleğe alır ve sınırı aşan kısmı temizler.
+        # package verilirse derlemenin indirdiği ya da okuduğu dosyalar o pakete ait olarak kaydedilir.
+        started = self.checkouts.pop(name, None)
+        work = os.path.join(WORK_ROOT, name)
+        if started is None or not os.path.isdir(work):
+            return
+
+        with self.locked():
+            index = self.load_index()
+            self.scan(index)
+            used = []
+            for subdir in SUBDIRS:
+                private = os.path.join(work, subdir)
+                if not os.path.isdir(private):
+                    continue
+                for entry in os.scandir(private):
+                    if not entry.is_file(follow_symlinks=False) or entry.name.endswith('.part'):
+                        continue
+                    if self.add(index, subdir, entry, started):
+                        used.append(os.path.join(subdir, entry.name))
+            shutil.rmtree(work, ignore_errors=True)
+            if package is not None and used:
+                index['owners'][package] = {'files': used, 'used': time.time()}
+            self.evict(index)
+            self.save_index(index)
+            PackageCache.warm = self.warm_set(index)
+
+    def add(self, index, subdir, entry, started):
+        # dosya bu derlemede indirildiyse ya da okunduysa True döner.
+        relative = os.path.join(subdir, entry.name)
+        shared = os.path.join(SHARED_ROOT, relative)
+        stat = entry.stat(follow_symlinks=False)
+        record = index['files'].get(relative)
+
+        if os.path.exists(shared) and os.path.samefile(shared, entry.path):
+            # önceden var olan dosya; derleme sırasında okunduysa kullanım zamanını güncelle.
+            if record is not None and stat.st_atime >= started:
+                record['used'] = time.time()
+                return True
+            return False
+        if os.path.exists(shared):
+            # başka bir derleme aynı isimle bizden önce eklemiş.
+            return True
+
+        sha1 = self.sha1file(entry.path) if subdir == 'archives' else None
+        duplicate = index['hashes'].get(sha1) if sha1 else None
+        source = entry.path
+        if duplicate and os.path.exists(os.path.join(SHARED_ROOT, duplicate)):
+            # aynı içerik farklı isimle zaten var, aynı inode'a bağlıyoruz.
+            source = os.path.join(SHARED_ROOT, duplicate)
+        elif sha1:
+            index['hashes'][sha1] = relative
+        os.link(source, shared)
+        index['files'][relative] = {'used': time.time(), 'size': stat.st_size, 'sha1': sha1}
+        return True
+
+    @staticmethod
+    def warm_set(index, limit=200):
+        # dosyalarının hepsi hâlâ önbellekte olan paketler, en son kullanılandan başlayarak.
+        owners = sorted(index['owners'].items(), key=lambda item: item[1]['used'], reverse=True)
+        return [package for package, owner in owners
+                if all(relative in index['files'] for relative in owner['files'])][:limit]
+
+    @classmethod
+    def warm_packages(cls):
+        # bu makinede derlenirse kaynak arşivlerini yeniden indirmeyecek paketler.
+        if cls.warm is None:
+            cls.warm = cls.warm_set(cls.load_index())
+        return cls.warm
+
+    def scan(self, index):
+        # önbellekte olup indekste olmayan dosyaları (ör: eski sürümlerden kalanlar) indekse ekler.
+        present = set()
+        for subdir in SUBDIRS:
+            shared = os.path.join(SHARED_ROOT, subdir)
+            if not os.path.isdir(shared):
+                continue
+            for entry in os.scandir(shared):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                relative = os.path.join(subdir, entry.name)
+                present.add(relative)
+                if relative in index['files']:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                sha1 = self.sha1file(entry.path) if subdir == 'archives' else None
+                duplicate = index['hashes'].get(sha1) if sha1 else None
+                if duplicate and os.path.exists(os.path.join(SHARED_ROOT, duplicate)) and not os.path.samefile(
+                        os.path.join(SHARED_ROOT, duplicate), entry.path):
+                    tmp = '%s.dedup' % entry.path
+                    os.link(os.path.join(SHARED_ROOT, duplicate), tmp)
+                    os.rename(tmp, entry.path)
+                elif sha1:
+                    index['hashes'][sha1] = relative
+                index['files'][relative] = {'used': max(stat.st_atime, stat.st_mtime),
+                                            'size': stat.st_size, 'sha1': sha1}
+
+        for relative in set(index['files']) - present:
+            self.forget(index, relative)
+        # dosyaları tamamen silinmiş paketleri unutuyoruz.
+        for package, owner in list(index['owners'].items()):
+            if not any(relative in index['files'] for relative in owner['files']):
+                del index['owners'][package]
+
+    def evict(self, index):
+        # en uzun süredir kullanılmayan dosyalardan başlayarak sınırın %90'ına kadar siler.
+        # Aynı içeriğe bağlı tüm isimler birlikte silinir; çalışan bir derlemenin çalışma
+        # dizininden de bağlı olan dosyalar silinse bile yer açılmayacağı için atlanır.
+        if not self.size_limit:
+            return
+
+        inodes = {}
+        for relative, record in index['files'].items():
+            try:
+                stat = os.stat(os.path.join(SHARED_ROOT, relative))
+            except FileNotFoundError:
+                continue
+            inode = inodes.setdefault((stat.st_dev, stat.st_ino), {'size': stat.st_size, 'links': stat.st_nlink,
+                                                                   'names': [], 'used': 0})
+            inode['names'].append(relative)
+            inode['used'] = max(inode['used'], record['used'])
+        total = sum(inode['size'] for inode in inodes.values())
+        if total <= self.size_limit:
+            return
+
+        target = self.size_limit * 0.9
+        freed = 0
+        for inode in sorted(inodes.values(), key=lambda inode: inode['used']):
+            if total - freed <= target:
+                break
+            if inode['links'] > len(inode['names']):
+                continue
+            for relative in inode['names']:
+                os.remove(os.path.join(SHARED_ROOT, relative))
+                self.forget(index, relative)
+            freed += inode['size']
+        if freed:
+            self.log.information('Pisi önbelleğinden %d MB silindi, önbellek %d MB.' % (freed >> 20,
+                                                                                   (total - freed) >> 20))
+        if total - freed > target:
+            self.log.warning('Pisi önbelleğindeki dosyalar çalışan derlemelerce kullanıldığı için önbellek '
+                             '%d MB altına indirilemedi.' % (target // (1 << 20)))
+
+    @staticmethod
+    def forget(index, relative):
+        record = index['files'].pop(relative, None)
+        if record and record.get('sha1') and index['hashes'].get(record['sha1']) == relative:
+            # aynı içeriğe sahip başka bir dosya varsa özeti ona devrediyoruz.
+            del index['hashes'][record['sha1']]
+            for other, other_record in index['files'].items():
+                if other_record.get('sha1') == record['sha1']:
+                    index['hashes'][record['sha1']] = other
+                    break
+
+    def locked(self):
+        return _CacheLock()
+
+    @staticmethod
+    def load_index():
+        try:
+            with open(INDEX_FILE, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        for key in ('files', 'hashes', 'owners'):
+            index.setdefault(key, {})
+        return index
+
+    @staticmethod
+    def save_index(index):
+        tmp = '%s.tmp' % INDEX_FILE
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.rename(tmp, INDEX_FILE)
+
+    @staticmethod
+    def sha1file(filepath):
+        sha = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            while True:
+                block = f.read(2 ** 20)
+                if not block:
+                    break
+                sha.update(block)
+        return sha.hexdigest()
+
+
+class CompilerCache:
+    # her paket için ayrı bir ccache dizini tutar. Dizinlerin her biri ccache'in kendi
+    # sınırı (-M) ile, toplamları ise en eski kullanılan paket dizini silinerek sınırlanır.
+    lock = threading.Lock()
+    # derlemesi süren paketler ve kaç yuvada derlendikleri; bu dizinler silinmez.
+    checkouts = {}
+
+    def __init__(self, size='5G', total_limit=0):
+        # size: ccache -M değeri (ör: 5G), total_limit: tüm dizinler için MB cinsinden sınır, 0 ise sınırsız.
+        self.size = size
+        self.total_limit = total_limit << 20
+        self.log = Log()
+
+    @staticmethod
+    def directory(package):
+        return os.path.join(CCACHE_ROOT, package)
+
+    def checkout(self, package):
+        directory = self.directory(package)
+        with self.lock:
+            os.makedirs(directory, exist_ok=True)
+            # son kullanım zamanı olarak dizinin mtime değerini kullanıyoruz.
+            os.utime(directory)
+            self.checkouts[package] = self.checkouts.get(package, 0) + 1
+        return directory
+
+    def checkin(self, package):
+        # derleme bitti; uzun süren derlemeler en eski kullanılan sayılmasın diye zamanı yeniliyoruz.
+        with self.lock:
+            count = self.checkouts.pop(package, 0) - 1
+            if count > 0:
+                self.checkouts[package] = count
+            try:
+                os.utime(self.directory(package))
+            except OSError:
+                pass
+
+    @staticmethod
+    def parse_stats(text):
+        # `ccache -s` çıktısından isabet ve ıska sayılarını okur (ccache 3.x ve 4.x biçimleri).
+        hits = misses = 0
+        for line in text.splitlines():
+            line = line.strip().lower()
+            match = re.match(r'cache hit \((direct|preprocessed)\)\s+(\d+)', line)
+            if match:
+                hits += int(match.group(2))
+                continue
+            match = re.match(r'cache miss\s+(\d+)', line)
+            if match:
+                misses += int(match.group(1))
+                continue
+            match = re.match(r'hits:\s+(\d+)', line)
+            if match:
+                hits = int(match.group(1))
+                continue
+            match = re.match(r'misses:\s+(\d+)', line)
+            if match:
+                misses = int(match.group(1))
+        return hits, misses
+
+    def report(self, package, stats_file):
+        # derleme sonrası ccache istatistiklerini okuyup (isabet, ıska) döner.
+        try:
+            with open(stats_file, 'r') as f:
+                hits, misses = self.parse_stats(f.read())
+        except OSError:
+            return None
+        total = hits + misses
+        if total:
+            self.log.information('%s paketi için ccache: %d isabet, %d ıska (%%%d).' %
+                                 (package, hits, misses, hits * 100 // total))
+        return hits, misses
+
+    def evict(self):
+        # toplam boyut sınırı aşıldıysa en uzun süredir kullanılmayan paket dizinlerini siler.
+        # Derlemesi süren paketlerin dizinleri toplama dahildir ama silinmez.
+        if not self.total_limit or not os.path.isdir(CCACHE_ROOT):
+            return
+        with self.lock:
+            directories = []
+            for entry in os.scandir(CCACHE_ROOT):
+                if entry.is_dir(follow_symlinks=False):
+                    size = 0
+                    for root, _, files in os.walk(entry.path):
+                        for name in files:
+                            try:
+                                size += os.lstat(os.path.join(root, name)).st_size
+                            except OSError:
+                                pass
+                    directories.append((entry.stat().st_mtime, size, entry.path, entry.name in self.checkouts))
+            total = sum(size for _, size, _, _ in directories)
+            for _, size, path, busy in sorted(directories):
+                if total <= self.total_limit:
+                    break
+                if busy:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+class _CacheLock:
+    # aynı süreçteki yuvalar için thread kilidi, farklı süreçler için flock kullanır.
+    def __enter__(self):
+        PackageCache.lock.acquire()
+        os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+        self.file = open(LOCK_FILE, 'w')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        PackageCache.lock.release()
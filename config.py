@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+import yaml
+
+
+CONFIG_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+# derleme özetleri, geçmiş ve iş günlüğü gibi kalıcı durum dosyalarının dizini.
+STATE_DIRECTORY = '/var/lib/gonullu'
+
+
+class ConfigFile:
+    # yapılandırma dosyasını bir kez okuyup önbellekte tutar. Dosya her erişimde değil,
+    # en fazla check_interval saniyede bir stat edilir ve sadece mtime değiştiyse yeniden okunur.
+    def __init__(self, name, parser=None, default=None, check_interval=5):
+        self.path = os.path.join(CONFIG_DIRECTORY, name)
+        self.parser = parser
+        self.default = default
+        self.check_interval = check_interval
+        self.value = default
+        self.mtime = None
+        self.checked = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        if time.time() - self.checked < self.check_interval:
+            return self.value
+
+        with self.lock:
+            # kilidi beklerken başka bir thread dosyayı okumuş olabilir.
+            now = time.time()
+            if now - self.checked < self.check_interval:
+                return self.value
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                self.value, self.mtime = self.default, None
+                self.checked = now
+                return self.value
+
+            if mtime != self.mtime:
+                with open(self.path, 'r') as f:
+                    data = yaml.safe_load(f)
+                self.value = self.parser(data) if self.parser else data
+                self.mtime = mtime
+            # kontrol zamanı değer okunduktan sonra yazılır; yoksa ilk okuma sürerken
+            # kilitsiz yoldan gelenler varsayılan değeri alırdı.
+            self.checked = now
+        return self.value
+
+    def save(self, data):
+        # dosyayı yazar ve önbelleği hemen günceller.
+        with self.lock:
+            tmp = '%s.tmp' % self.path
+            with open(tmp, 'w') as f:
+                yaml.dump(data, f)
+            os.rename(tmp, self.path)
+            self.value = self.parser(data) if self.parser else data
+            self.mtime = os.stat(self.path).st_mtime_ns
+            self.checked = time.time()
+
+
+def package_set(data):
+    # paket listesini hızlı arama için frozenset'e çevirir.
+    if data is None:
+        return frozenset()
+    if not isinstance(data, list):
+        raise ValueError('paket listesi bekleniyordu')
+    return frozenset(str(package) for package in data)
+
+
+SANDBOX_EXEMPT = ConfigFile('sandbox-requirement.yml', package_set, frozenset())
+KERNEL_REQUIRED = ConfigFile('kernel-requirement.yml', package_set, frozenset())
+MAIL_CONFIG = ConfigFile('mail_config.yml', default={'email': None, 'is_verified': False})
+
+
+def sandbox_required(package):
+    # sandbox-requirement.yml listesindeki paketler sandbox olmadan derlenir.
+    return package not in SANDBOX_EXEMPT.get()
+
+
+def kernel_required(package):
+    # kernel-requirement.yml listesindeki paketler derlenirken çekirdek paketi de kurulur.
+    return package in KERNEL_REQUIRED.get()
+
+
+def mail_config():
+    return dict(MAIL_CONFIG.get() or MAIL_CONFIG.default)
+
+
+def save_mail_config(email, is_verified):
+    # değişiklik yoksa diske yazmıyoruz.
+    config = mail_config()
+    if config.get('email') == email and config.get('is_verified') == is_verified:
+        return
+    config['email'] = email
+    config['is_verified'] = is_verified
+    MAIL_CONFIG.save(config)
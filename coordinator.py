@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import select
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from config import mail_config
+from farm import Farm
+from log import Log
+
+
+def usage():
+    print("""
+Birden fazla derleme makinesini ciftlige tek bir istemci olarak baglar.
+Koordinator ciftlikten paketleri tek bir baglanti ile alir, bekleyen
+makineler arasinda bos yuva sayisina, makinede bulunan imajlara ve paketin
+kaynak arsivlerinin o makinenin onbelleginde olup olmadigina gore dagitir.
+Makinelerin gonderimleri ve sonuc bildirimleri koordinator uzerinden
+ciftlige iletilir.
+Koordinator kimlik dogrulamasi yapmaz, varsayilan olarak sadece 127.0.0.1
+adresini dinler. Asagidaki satir, koordinatoru guvenilir bir agdaki diger
+makinelere 8080 portunda acar.
+\tpython3 coordinator.py --email=gonullu@pisilinux.org --address=0.0.0.0 --port=8080
+Derleme makinelerinde ise gonullu koordinatore baglanir.
+\tsudo gonullu --farm=http://koordinator:8080 --slots=4
+""")
+    sys.exit()
+
+
+class Node:
+    # koordinatöre bağlı tek bir derleme makinesi.
+    def __init__(self, name):
+        self.name = name
+        self.images = set()
+        self.warm = set()
+        self.packages = set()
+        self.assigned = 0
+        self.completed = 0
+        self.last_seen = time.time()
+
+    def update(self, headers):
+        self.last_seen = time.time()
+        images = headers.get('X-Gonullu-Images')
+        if images is not None:
+            self.images = set(image for image in images.split(',') if image)
+        warm = headers.get('X-Gonullu-Warm')
+        if warm is not None:
+            self.warm = set(package for package in warm.split(',') if package)
+
+
+class Waiter:
+    # paket bekleyen bir yuvanın (long-poll isteği) kaydı.
+    def __init__(self, node):
+        self.node = node
+        self.job = None
+        self.event = threading.Event()
+
+
+class Coordinator:
+    # gönüllü makineler için çiftlik gibi davranan, çiftliğe ise tek bir istemci olarak
+    # bağlanan koordinatörümüz. Paketler sadece bekleyen bir yuva varken (ya da prefetch
+    # kadar önceden) çiftlikten istenir; böylece çiftliğe gelen yük makine sayısıyla artmaz.
+    SLOT_WEIGHT = 1
+    IMAGE_WEIGHT = 5
+    PACKAGE_WEIGHT = 3
+    WARM_WEIGHT = 10
+
+    def __init__(self, farm, address='127.0.0.1', port=8080, prefetch=0):
+        self.farm = farm
+        self.prefetch = prefetch
+        self.log = Log()
+        self.lock = threading.Condition()
+        self.nodes = {}
+        self.waiters = []
+        self.jobs = []
+        self.assignments = {}
+        self.running = True
+        self.stopped = threading.Event()
+        self.server = ThreadingHTTPServer((address, port), CoordinatorHandler)
+        self.server.daemon_threads = True
+        self.server.coordinator = self
+        self.fetcher = threading.Thread(target=self.fetch, name='gonullu-coordinator-fetch', daemon=True)
+
+    def start(self):
+        self.fetcher.start()
+        threading.Thread(target=self.server.serve_forever, name='gonullu-coordinator', daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            # bekleyen yuvalar iş verilmeden hemen yanıtlansın.
+            for waiter in self.waiters:
+                waiter.event.set()
+            self.lock.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        self.stopped.set()
+
+    def node(self, name, headers):
+        with self.lock:
+            node = self.nodes.get(name)
+            if node is None:
+                node = self.nodes[name] = Node(name)
+                self.log.information('%s makinesi koordinatöre bağlandı.' % name)
+            node.update(headers)
+            return node
+
+    def free_slots(self, node):
+        return sum(1 for waiter in self.waiters if waiter.node is node)
+
+    def score(self, node, job):
+        # işin bu makineye verilmesinin ne kadar uygun olduğu; büyük olan tercih edilir.
+        score = self.SLOT_WEIGHT * self.free_slots(node)
+        if job['dockerimage'] in node.images:
+            score += self.IMAGE_WEIGHT
+        if job['package'] in node.warm:
+            # makine paketin kaynak arşivlerinin ve bağımlılıklarının önbelleğinde olduğunu bildirmiş.
+            score += self.WARM_WEIGHT
+        elif job['package'] in node.packages:
+            # paket daha önce bu makinede derlenmiş, önbellekleri büyük ihtimalle sıcak.
+            score += self.PACKAGE_WEIGHT
+        return score
+
+    def dispatch(self):
+        # bekleyen işler ile yuvaları en uygun çiftten başlayarak eşleştirir (kilit tutulurken çağrılır).
+        # puanlar eşitse önce kuyruğa giren iş verilir.
+        while self.jobs and self.waiters:
+            _, job, waiter = max(((position, job, waiter) for position, job in enumerate(self.jobs)
+                                  for waiter in self.waiters),
+                                 key=lambda pair: (self.score(pair[2].node, pair[1]), -pair[0]))
+            self.jobs.remove(job)
+            self.waiters.remove(waiter)
+            waiter.job = job
+            waiter.node.assigned += 1
+            waiter.node.packages.add(job['package'])
+            self.assignments[str(job['queue_id'])] = {'node': waiter.node.name, 'package': job['package'],
+                                                      'assigned': time.time()}
+            waiter.event.set()
+            self.log.information('%s paketi %s makinesine verildi.' % (job['package'], waiter.node.name))
+
+    def request(self, node, wait):
+        # bir yuvanın paket isteği; iş gelene kadar en fazla wait saniye bekletilir.
+        waiter = Waiter(node)
+        with self.lock:
+            if not self.running:
+                return waiter
+            self.waiters.append(waiter)
+            self.dispatch()
+            self.lock.notify_all()
+        waiter.event.wait(wait)
+        with self.lock:
+            if waiter.job is None and waiter in self.waiters:
+                self.waiters.remove(waiter)
+        return waiter
+
+    def fetch(self):
+        # çiftlikten sadece ihtiyaç kadar paket isteyen tek döngümüz.
+        while True:
+            with self.lock:
+                while self.running and len(self.jobs) >= len(self.waiters) + self.prefetch:
+                    self.lock.wait()
+                if not self.running:
+                    return
+            try:
+                response = self.farm.get_package()
+            except SystemExit:
+                # çiftlik mail adresini ya da imajı reddetti; makineleri boşuna bekletmeden kapanıyoruz.
+                self.log.error('Çiftlik paket isteğini reddetti, koordinatör kapatılıyor.')
+                threading.Thread(target=self.stop, name='gonullu-coordinator-stop', daemon=True).start()
+                return
+            except Exception as e:
+                self.log.error('Çiftlikten paket istenirken hata oluştu: %s' % str(e))
+                self.farm.error_wait()
+                continue
+            if response == -1:
+                self.farm.idle_wait()
+            elif isinstance(response, dict):
+                self.farm.reset_poll()
+                with self.lock:
+                    self.jobs.append(response)
+                    self.dispatch()
+
+    def requeue(self, waiter):
+        # işi alamadan bağlantısı kopan yuvanın işini kuyruğun başına geri koyar.
+        job = waiter.job
+        with self.lock:
+            self.assignments.pop(str(job['queue_id']), None)
+            waiter.node.assigned -= 1
+            self.jobs.insert(0, job)
+            self.dispatch()
+        self.log.warning('%s makinesinin bağlantısı koptu, %s paketi tekrar kuyruğa alındı.' %
+                         (waiter.node.name, job['package']))
+
+    def report(self, queue_id, state):
+        # sonucu çiftliğe iletir, iletilemezse makine bir sonraki açılışta tekrar dener.
+        response = self.farm.get('updaterunning?id=%s&state=%s' % (queue_id, state), json=False)
+        if response == -2:
+            return None
+        with self.lock:
+            assignment = self.assignments.pop(str(queue_id), None)
+            if assignment is not None and assignment['node'] in self.nodes:
+                self.nodes[assignment['node']].completed += 1
+        return response
+
+    def status(self):
+        with self.lock:
+            return {
+                'queued': [job['package'] for job in self.jobs],
+                'waiting': len(self.waiters),
+                'assignments': self.assignments,
+                'nodes': {name: {'free_slots': self.free_slots(node), 'assigned': node.assigned,
+                                 'completed': node.completed, 'images': sorted(node.images),
+                                 'warm': len(node.warm),
+                                 'last_seen': node.last_seen} for name, node in self.nodes.items()},
+            }
+
+
+class BodyReader:
+    # gelen gönderim gövdesini belleğe almadan, uzunluğu bilinen bir dosya gibi çiftliğe aktarır.
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, body, content_type='application/json', status=200, headers=None):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        coordinator = self.server.coordinator
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+
+        if parts[0] == 'requestPkg':
+            node = coordinator.node(self.headers.get('X-Gonullu-Node', self.client_address[0]), self.headers)
+            waiter = coordinator.request(node, min(float(query.get('wait', ['0'])[0]), 60))
+            if waiter.job is not None and self.disconnected():
+                coordinator.requeue(waiter)
+                return
+            try:
+                self.reply(json.dumps(waiter.job if waiter.job is not None else {'state': 402}),
+                           headers={'X-Long-Poll': '1'})
+            except OSError:
+                self.close_connection = True
+                if waiter.job is not None:
+                    coordinator.requeue(waiter)
+        elif parts[0] == 'updaterunning':
+            response = coordinator.report(query['id'][0], query['state'][0])
+            if response is None:
+                self.reply('', 'text/plain', status=502)
+            else:
+                self.reply(response.content, response.headers.get('Content-Type', 'text/plain'))
+        elif parts[0] == 'status':
+            self.reply(json.dumps(coordinator.status()))
+        else:
+            self.send_error(404)
+
+    def disconnected(self):
+        # long-poll sırasında istemci bağlantıyı kapatmış mı (okunabilir ama veri yok).
+        try:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def do_POST(self):
+        coordinator = self.server.coordinator
+        path = urlparse(self.path).path.strip('/')
+        if path != 'upload' and not path.startswith('delta/'):
+            self.send_error(404)
+            return
+        body = BodyReader(self.rfile, int(self.headers.get('Content-Length', 0)))
+        farm = coordinator.farm
+        headers = {'Content-Type': self.headers.get('Content-Type')}
+        if self.headers.get('X-Gonullu-Chunks') is not None:
+            headers['X-Gonullu-Chunks'] = self.headers.get('X-Gonullu-Chunks')
+        try:
+            response = farm.session.post('%s/%s' % (farm.url, path), data=body, headers=headers,
+                                         timeout=farm.upload_timeout)
+            # fark gönderiminin 404 (desteklenmiyor) ve 409 (eksik parça) yanıtları makineye aynen iletilir.
+            if response.status_code not in (404, 409):
+                response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            coordinator.log.error('Gönderim çiftliğe iletilemedi: %s' % str(e))
+            # gövdenin okunmayan kısmı bağlantıda kalmasın.
+            while body.read(2 ** 20):
+                pass
+            self.reply('', 'text/plain', status=502)
+            return
+        self.reply(response.content, response.headers.get('Content-Type', 'text/plain'), status=response.status_code)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    log = Log()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-k', '--kullanim', action='store_true', dest='usage', default=False)
+    parser.add_argument('-e', '--email', action='store', dest='email', default=None, type=str)
+    parser.add_argument('--farm', action='store', dest='farm', default='http://31.207.82.178', type=str)
+    parser.add_argument('--address', action='store', dest='address', default='127.0.0.1', type=str)
+    parser.add_argument('--port', action='store', dest='port', default=8080, type=int)
+    parser.add_argument('--prefetch', action='store', dest='prefetch', default=0, type=int)
+    parser.add_argument('--farm-pool', action='store', dest='farm_pool', default=32, type=int)
+    args = parser.parse_args()
+
+    if args.usage:
+        usage()
+
+    email = args.email or mail_config().get('email')
+    if not email:
+        log.error('Lütfen --email ile çiftlikte kayıtlı mail adresinizi veriniz.')
+        log.get_exit()
+
+    coordinator = Coordinator(Farm(args.farm.rstrip('/'), email, pool_size=args.farm_pool),
+                              args.address, args.port, args.prefetch).start()
+    log.information('Koordinatör %s:%d adresinde çalışıyor.' % (args.address, args.port))
+    try:
+        coordinator.stopped.wait()
+        sys.exit(1)
+    except KeyboardInterrupt:
+        coordinator.stop()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+
+from config import STATE_DIRECTORY
+from log import Log
+
+
+DELTA_DIRECTORY = os.path.join(STATE_DIRECTORY, 'delta')
+
+# .pisi dosyaları içerikten belirlenen sınırlarla parçalara bölünür: sınır, en küçük parça
+# boyutundan sonra ANCHOR dizisinin geçtiği ilk yerdir, bulunamazsa en büyük boyutta kesilir.
+# Dosyanın ortasına eklenen ya da silinen bir bölüm sadece çevresindeki parçaları değiştirir,
+# sonraki sınırlar aynı yerlere denk gelir. Çiftlik tarafı da aynı değerlerle bölmelidir.
+ANCHOR = b'\xa5\x3c'
+MIN_CHUNK = 16 << 10
+MAX_CHUNK = 256 << 10
+READ_SIZE = 1 << 20
+
+
+def boundary(data, start, final=True):
+    # data[start:] içindeki ilk parçanın bittiği yer. final değilse veri devam ediyordur,
+    # en büyük parça boyutu kadar veri yoksa sınır henüz belli değildir (None).
+    end = start + MAX_CHUNK
+    if end > len(data):
+        if not final:
+            return None
+        end = len(data)
+    position = data.find(ANCHOR, start + MIN_CHUNK, end)
+    return end if position == -1 else position + len(ANCHOR)
+
+
+def split(data):
+    # bellekteki verinin parçaları: [(sha1, başlangıç, bitiş), ...]
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = boundary(data, start)
+        chunks.append((hashlib.sha1(data[start:end]).hexdigest(), start, end))
+        start = end
+    return chunks
+
+
+def chunk_file(path):
+    # dosyayı bir kez okuyarak parça özetlerini ve tüm dosyanın sha1 özetini çıkarır.
+    sha1 = hashlib.sha1()
+    chunks = []
+    size = 0
+    buffer = b''
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(READ_SIZE)
+            sha1.update(data)
+            size += len(data)
+            buffer += data
+            start = 0
+            while start < len(buffer):
+                end = boundary(buffer, start, final=not data)
+                if end is None:
+                    break
+                chunks.append([hashlib.sha1(buffer[start:end]).hexdigest(), end - start])
+                start = end
+            buffer = buffer[start:]
+            if not data:
+                break
+    return {'sha1': sha1.hexdigest(), 'size': size, 'chunks': chunks}
+
+
+class DeltaRecords:
+    # her paketin en son gönderilen .pisi dosyasının parça özetleri. Fark gönderiminde
+    # bu parçaların çiftlikte bulunduğu varsayılır, eksik çıkanlar çiftlik söyleyince gönderilir.
+    def __init__(self, directory=DELTA_DIRECTORY):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.log = Log()
+
+    @staticmethod
+    def key(file):
+        # <kuyruk>-<commit>-<paket>-<sürüm>-<yayın>-<dağıtım>-<mimari>.pisi -> <paket>
+        name = os.path.basename(file).split('-', 2)[-1]
+        return name.rsplit('-', 4)[0]
+
+    def path(self, file):
+        return os.path.join(self.directory, '%s.json' % self.key(file))
+
+    def load(self, file):
+        try:
+            with open(self.path(file), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def remember(self, file, manifest):
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp = '%s.tmp' % self.path(file)
+                with open(tmp, 'w') as f:
+                    json.dump(dict(manifest, file=os.path.basename(file)), f)
+                os.rename(tmp, self.path(file))
+            except OSError as e:
+                self.log.warning('%s dosyasının parça kaydı yazılamadı: %s' % (file, str(e)))
+
+
+records = DeltaRecords()
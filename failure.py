@@ -0,0 +1,139 @@
+import glob
+import os
+import re
+
+
+# derleme hatalarının türleri.
+SETUP = 'setup'
+DEPENDENCY = 'dependency'
+FETCH = 'fetch'
+COMPILE = 'compile'
+# container .bitti yazamadan durduysa: bellek sınırı aşıldı ya da container öldürüldü.
+OOM = 'oom'
+KILLED = 'killed'
+
+# pisi'nin hata çıktısında hatanın türünü belli eden satırlar, sıra önemli.
+PATTERNS = (
+    (DEPENDENCY, re.compile(r'(build dependencies|unsatisfied (build )?dependenc(y|ies)|dependenc(y|ies) .*not (satisfied|found)|'
+                            r'not found in (any|the) (active )?repositor|bağımlılık)', re.IGNORECASE)),
+    (FETCH, re.compile(r'(could not fetch|unable to (fetch|download)|fetch(ing)? (failed|error)|'
+                       r'sha1sum .*(mismatch|error)|indirilemedi)', re.IGNORECASE)),
+)
+
+# sonuçta hata bulunamazsa .log dosyasının sonundan okunan kısım.
+TAIL_SIZE = 64 << 10
+
+
+class FailureDetector:
+    # derleme sürerken paketin .stages dosyasını ve .err loglarını takip ederek hatayı
+    # erkenden sınıflandırır: hazırlık (setup), bağımlılık, kaynak indirme ya da derleme hatası.
+    # Loglar her taramada sadece yeni eklenen kısımları kadar okunur.
+    def __init__(self, directory):
+        self.directory = directory
+        self.offsets = {}
+        self.remainders = {}
+        self.kind = None
+        self.line = None
+
+    def stages(self):
+        marks = {}
+        try:
+            with open(os.path.join(self.directory, '.stages'), 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        marks[parts[0]] = parts[1]
+        except OSError:
+            pass
+        return marks
+
+    @staticmethod
+    def match(line):
+        for kind, pattern in PATTERNS:
+            if pattern.search(line):
+                return kind
+        return None
+
+    def follow(self, path):
+        # dosyanın son taramadan beri eklenen satırlarını döner.
+        offset = self.offsets.get(path, 0)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return []
+        self.offsets[path] = offset + len(data)
+        lines = (self.remainders.pop(path, b'') + data).split(b'\n')
+        self.remainders[path] = lines.pop()
+        return [line.decode('utf-8', 'replace') for line in lines]
+
+    def last_line(self):
+        for path in glob.glob(os.path.join(self.directory, '*.err')):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(max(0, os.path.getsize(path) - 4096))
+                    lines = [line for line in f.read().decode('utf-8', 'replace').splitlines() if line.strip()]
+            except OSError:
+                continue
+            if lines:
+                return lines[-1]
+        return None
+
+    def found(self, kind, line):
+        self.kind = kind
+        self.line = line.strip()[:500]
+        return kind
+
+    def scan(self):
+        # hata görüldüyse türünü, görülmediyse None döner.
+        if self.kind is not None:
+            return self.kind
+        if 'setup_failed' in self.stages():
+            # derleme betiği hazırlık çıktısını .err olarak yazar, son satırı hatayı gösterir.
+            return self.found(SETUP, self.last_line() or 'hazırlık adımları başarısız oldu')
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.err'))):
+            for line in self.follow(path):
+                kind = self.match(line)
+                if kind is not None:
+                    return self.found(kind, line)
+        return None
+
+    def classify(self, status):
+        # derleme bittikten sonra .bitti'deki sonuca göre hatanın türünü döner, başarılıysa None.
+        if not status:
+            return None
+        if self.scan() is not None:
+            return self.kind
+        for path in list(self.remainders):
+            kind = self.match(self.remainders[path].decode('utf-8', 'replace'))
+            if kind is not None:
+                return self.found(kind, self.remainders[path].decode('utf-8', 'replace'))
+        # bazı hatalar .err yerine .log'a yazılır, büyük olabileceği için sadece sonuna bakıyoruz.
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.log'))):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(max(0, os.path.getsize(path) - TAIL_SIZE))
+                    lines = f.read().decode('utf-8', 'replace').splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                kind = self.match(line)
+                if kind is not None:
+                    return self.found(kind, line)
+        return self.found(COMPILE, 'derleme hatası')
+
+    def stopped(self, exit_code, oom_killed):
+        # container pisi sonucu yazamadan durdu; sınıflandırılacak bir çıktı yoktur.
+        if oom_killed:
+            return self.found(OOM, 'container bellek sınırını aştığı için durduruldu')
+        return self.found(KILLED, 'container %s çıkış kodu ile sonuç yazmadan durdu' % exit_code)
+
+    def relevant_files(self, kind):
+        # hata türüne göre çiftliğe gönderilmesi gereken loglar. Hazırlık, bağımlılık ve indirme
+        # hatalarında derleme logu yoktur ya da anlamsızdır, sadece hata çıktısı gönderilir.
+        logs = sorted(glob.glob(os.path.join(self.directory, '*.log')))
+        errors = sorted(glob.glob(os.path.join(self.directory, '*.err')))
+        if kind in (SETUP, DEPENDENCY, FETCH):
+            return errors or logs
+        return logs + errors
@@ -0,0 +1,283 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+
+import requests
+from docker.errors import NotFound
+
+
+class FakeContainer:
+    def __init__(self, name, image, command, binds):
+        self.id = uuid.uuid4().hex
+        self.name = name or self.id[:12]
+        self.image = image
+        self.command = command or ''
+        self.binds = binds or {}
+        self.running = False
+        self.exit_code = None
+        self.oom_killed = False
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def host_path(self, path):
+        # container içindeki bir yolun bağlandığı host dizinini bulur.
+        for local, bind in self.binds.items():
+            if bind['bind'] == path:
+                return local
+        return None
+
+
+class FakeDockerClient:
+    # docker.APIClient'ın gönüllünün kullandığı kısmını taklit eden sahte istemcimiz.
+    # Container çalıştırmak yerine derleme betiğinin yazacağı dosyaları belirlenen
+    # sürede üretir; böylece docker olmadan uçtan uca ölçüm yapılabilir.
+    build_time = 5.0
+    jitter = 0.0
+    artifacts = 2
+    artifact_size = 1 << 20
+    # aynı paketin her derlemesinde .pisi dosyalarının değişen oranı; 1 ise tamamı rastgeledir.
+    artifact_change = 1.0
+    log_size = 256 << 10
+    failure_rate = 0.0
+    # başarısız derlemelerin türü: setup ve dependency hemen, compile derleme süresi sonunda başarısız olur.
+    # oom'da container derleme süresi sonunda bellek sınırı yüzünden .bitti yazamadan öldürülür.
+    failure_kind = 'compile'
+    memory_usage = 512 << 20
+    # paketin kaynak arşivi önbellekte yoksa indirme için harcanan süre.
+    download_time = 0.0
+
+    lock = threading.Lock()
+    containers_by_id = {}
+    images = {}
+    # paket adına göre container'ın gerçekte çalıştığı süreler (başlangıç, bitiş).
+    runs = {}
+    # kaynak arşivi indirilmek zorunda kalınan paketler.
+    downloads = []
+
+    def __init__(self, base_url=None, version=None, **kwargs):
+        self.base_url = base_url
+        self.version = version
+
+    @classmethod
+    def configure(cls, **options):
+        for key, value in options.items():
+            if not hasattr(cls, key):
+                raise AttributeError(key)
+            setattr(cls, key, value)
+
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.containers_by_id.clear()
+            cls.images.clear()
+            cls.runs.clear()
+            del cls.downloads[:]
+
+    def find(self, container):
+        if isinstance(container, dict):
+            container = container.get('Id')
+        with self.lock:
+            if container in self.containers_by_id:
+                return self.containers_by_id[container]
+            for item in self.containers_by_id.values():
+                if item.name == container:
+                    return item
+        raise NotFound('%s bulunamadı' % container)
+
+    @staticmethod
+    def create_host_config(**kwargs):
+        return kwargs
+
+    def create_container(self, image=None, command=None, name=None, volumes=None, host_config=None, **kwargs):
+        container = FakeContainer(name, image, command, (host_config or {}).get('binds'))
+        with self.lock:
+            self.containers_by_id[container.id] = container
+        return {'Id': container.id, 'Warnings': []}
+
+    def start(self, container):
+        container = self.find(container)
+        container.running = True
+        container.started = time.time()
+        container.thread = threading.Thread(target=self.execute, args=(container,), name='fake-%s' % container.name,
+                                            daemon=True)
+        container.thread.start()
+
+    def execute(self, container):
+        # derleme betiğinin çıktılarını (.stages, loglar, .pisi dosyaları, .bitti) taklit eder.
+        arguments = container.command.split()
+        status = 0
+        if len(arguments) == 4 and os.path.basename(arguments[0]).startswith('build-'):
+            _, queue_id, commit_id, package = arguments
+            output = container.host_path('/root/%s' % package)
+            duration = max(0.0, self.build_time + random.uniform(-self.jitter, self.jitter))
+            status = 1 if random.random() < self.failure_rate else 0
+            if output is not None:
+                os.makedirs(output, exist_ok=True)
+                prefix = '%s-%s' % (queue_id, commit_id)
+                with open(os.path.join(output, '.stages'), 'w') as f:
+                    f.write('setup %f\n' % time.time())
+                    if status and self.failure_kind == 'setup':
+                        f.write('setup_failed %f\n' % time.time())
+                        with open(os.path.join(output, '%s-%s.err' % (prefix, package)), 'w') as err:
+                            err.write('Error: Could not update repository index\n')
+                        self.finish_build(container, status, package, output)
+                        return
+                    self.fetch_archive(container, package)
+                    f.write('compile %f\n' % time.time())
+                if status and self.failure_kind == 'dependency':
+                    duration = 0.0
+                if container.stopped.wait(duration):
+                    status = 137
+                for name in ('%s-%s.log' % (prefix, package), '%s-%s.err' % (prefix, package)):
+                    self.write_file(os.path.join(output, name), self.log_size, text=True)
+                if status == 1 and self.failure_kind == 'oom':
+                    container.oom_killed = True
+                    self.finish_build(container, 137, package)
+                    return
+                if status and self.failure_kind == 'dependency':
+                    with open(os.path.join(output, '%s-%s.err' % (prefix, package)), 'a') as err:
+                        err.write('\nError: Unsatisfied build dependencies: libfoo-devel\n')
+                with open(os.path.join(output, '.stages'), 'a') as f:
+                    f.write('end %f\n' % time.time())
+                if status == 0:
+                    for index in range(self.artifacts):
+                        # ilk çıktı paketin kendisi, diğerleri alt paketleri (ör: paket-devel).
+                        name = '%s-%s%s-1.0-1-p0-x86_64.pisi' % (prefix, package, '-sub%d' % index if index else '')
+                        part = os.path.join(output, '.%s.part' % name)
+                        self.write_artifact(part, '%s-%d' % (package, index))
+                        os.rename(part, os.path.join(output, name))
+            self.finish_build(container, status, package, output)
+            return
+        self.finish_build(container, status)
+
+    def finish_build(self, container, status, package=None, output=None):
+        if output is not None:
+            with open(os.path.join(output, '%s.bitti' % package), 'w') as f:
+                f.write('%d\n' % status)
+        if package is not None:
+            with self.lock:
+                self.runs[package] = (container.started, time.time())
+        container.exit_code = status
+        container.finished = time.time()
+        container.running = False
+        container.done.set()
+
+    def fetch_archive(self, container, package):
+        # pisi'nin kaynak arşivini önbellekte bulamayınca indirmesini taklit eder.
+        archives = container.host_path('/var/cache/pisi/archives')
+        if archives is None or not self.download_time:
+            return
+        archive = os.path.join(archives, '%s.tar.xz' % package)
+        if os.path.exists(archive):
+            return
+        container.stopped.wait(self.download_time)
+        self.write_file(archive, 1 << 16)
+        with self.lock:
+            self.downloads.append(package)
+
+    def write_artifact(self, path, seed):
+        # paketin önceki derlemesi ile artifact_change oranı dışında aynı olan bir .pisi üretir.
+        if self.artifact_change >= 1:
+            self.write_file(path, self.artifact_size)
+            return
+        content = bytearray(random.Random(seed).randbytes(self.artifact_size))
+        changed = int(self.artifact_size * self.artifact_change)
+        if changed:
+            offset = random.randrange(0, self.artifact_size - changed + 1)
+            content[offset:offset + changed] = os.urandom(changed)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    @staticmethod
+    def write_file(path, size, text=False):
+        with open(path, 'wb') as f:
+            while size > 0:
+                block = min(size, 1 << 20)
+                f.write(b'derleme satiri <ok>\n' * (block // 20) + b'.' * (block % 20) if text
+                        else os.urandom(block))
+                size -= block
+
+    def wait(self, container, timeout=None, **kwargs):
+        container = self.find(container)
+        if not container.done.wait(timeout):
+            raise requests.exceptions.ReadTimeout('wait zaman aşımı')
+        return {'StatusCode': container.exit_code}
+
+    def inspect_container(self, container):
+        container = self.find(container)
+        return {'Id': container.id, 'Name': '/%s' % container.name,
+                'State': {'Running': container.running, 'OOMKilled': container.oom_killed,
+                          'ExitCode': container.exit_code or 0}}
+
+    def containers(self, all=False, **kwargs):
+        with self.lock:
+            items = list(self.containers_by_id.values())
+        return [{'Id': item.id, 'Names': ['/%s' % item.name]} for item in items if all or item.running]
+
+    def stats(self, container, stream=False, **kwargs):
+        container = self.find(container)
+        elapsed = (container.finished or time.time()) - (container.started or time.time())
+        return {'memory_stats': {'usage': self.memory_usage, 'max_usage': self.memory_usage},
+                'cpu_stats': {'cpu_usage': {'total_usage': int(elapsed * 1e9)}},
+                'blkio_stats': {'io_service_bytes_recursive': []}}
+
+    def stop(self, container, **kwargs):
+        container = self.find(container)
+        container.stopped.set()
+        if container.thread is not None:
+            container.thread.join()
+
+    def remove_container(self, container, force=False, **kwargs):
+        container = self.find(container)
+        if container.running and not force:
+            raise RuntimeError('%s çalışıyor' % container.name)
+        container.stopped.set()
+        with self.lock:
+            self.containers_by_id.pop(container.id, None)
+
+    def pause(self, container):
+        self.find(container)
+
+    def unpause(self, container):
+        self.find(container)
+
+    def logs(self, container, **kwargs):
+        self.find(container)
+        return b''
+
+    def image_id(self, image):
+        return 'sha256:%s' % hashlib.sha256(image.encode('utf-8')).hexdigest()
+
+    def inspect_image(self, image):
+        with self.lock:
+            labels = self.images.get(image)
+        if labels is None and image.startswith('gonullu-warm:'):
+            raise NotFound('%s bulunamadı' % image)
+        return {'Id': self.image_id(image), 'RepoDigests': ['%s@sha256:benchmark' % image.split(':')[0]],
+                'Config': {'Labels': labels or {}}}
+
+    @staticmethod
+    def inspect_distribution(image):
+        return {'Descriptor': {'digest': 'sha256:benchmark'}}
+
+    @staticmethod
+    def pull(image, stream=False, **kwargs):
+        return iter([])
+
+    def commit(self, container, repository=None, tag=None, changes=None, **kwargs):
+        self.find(container)
+        labels = {}
+        for change in changes or []:
+            if change.startswith('LABEL '):
+                for pair in change[len('LABEL '):].split():
+                    key, _, value = pair.partition('=')
+                    labels[key] = value
+        with self.lock:
+            self.images['%s:%s' % (repository, tag)] = labels
+        return {'Id': self.image_id('%s:%s' % (repository, tag))}
@@ -1,84 +1,281 @@
 import glob
+import hashlib
+import io
+import random
+import socket
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import shutil
+from config import mail_config, save_mail_config
+from delta import chunk_file, records
+from journal import journal
 from log import Log
+from logstream import log_body
+from metrics import metrics
+
+
+class MultipartFile:
+    # dosyayı multipart/form-data gövdesi olarak parça parça gönderirken
+    # aynı geçişte sha1 özetini de hesaplayan okuyucumuz.
+    def __init__(self, filepath, fields, field_name='file', fileobj=None, filename=None, size=None):
+        # fileobj verilirse diskteki dosya yerine ondan (ör: akan bir log gövdesi) okunur.
+        self.boundary = uuid.uuid4().hex
+        self.sha1 = hashlib.sha1()
+        head = ''
+        for key, value in fields.items():
+            head += '--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n' % (self.boundary, key, value)
+        head += '--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n' \
+                'Content-Type: application/octet-stream\r\n\r\n' % (self.boundary, field_name,
+                                                                     filename or os.path.basename(filepath))
+        head = head.encode('utf-8')
+        tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+        self.length = len(head) + (os.path.getsize(filepath) if size is None else size) + len(tail)
+        self.file = fileobj if fileobj is not None else open(filepath, 'rb')
+        self.parts = [io.BytesIO(head), self.file, io.BytesIO(tail)]
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        data = b''
+        while self.parts and len(data) < size:
+            part = self.parts[0]
+            block = part.read(size - len(data))
+            if not block:
+                self.parts.pop(0)
+                continue
+            if part is self.file:
+                self.sha1.update(block)
+            data += block
+        return data
+
+    def hexdigest(self):
+        return self.sha1.hexdigest()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class DeltaUnsupported(Exception):
+    # çiftliğin fark gönderimi uç noktaları yok.
+    pass
 
 
 class Farm:
-    def __init__(self, farm_url, email):
+    def __init__(self, farm_url, email, upload_workers=4, upload_retries=8, pool_size=10, timeout=(30, 300),
+                 upload_timeout=(60, 600), retries=3, session=None, log_compression=None, delta_uploads=False):
         self.url = farm_url
         self.email = email
+        self.upload_workers = max(1, upload_workers)
+        self.upload_retries = max(1, upload_retries)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.upload_timeout = upload_timeout
+        self.retries = retries
+        self.log_compression = log_compression
+        # .pisi dosyalarının sadece önceki gönderimden farklı parçalarını gönderir; çiftlik
+        # desteklemiyorsa (delta uç noktaları 404 dönerse) tam gönderime geri dönülür.
+        self.delta_uploads = delta_uploads
+        self.delta_supported = True
+        # tüm istekler aynı bağlantı havuzunu kullanır; böylece her istekte yeniden
+        # TCP/TLS el sıkışması yapılmaz. Havuz, aynı anda yapılan gönderimlere yetecek kadar büyük olmalı.
+        self.session = session if session else self.create_session(pool_size, retries, farm_url)
         self.time = 10
         self.total_error_time = 10
+        # uyarlanabilir paket isteme: boşta beklerken aralık poll_min'den poll_max'a kadar
+        # büyür, hata olursa error_max'a kadar üssel olarak artar. Çiftlik long-poll
+        # destekliyorsa istek zaten sunucuda beklediği için ayrıca beklemeyiz.
+        self.poll_min = 1
+        self.poll_max = 30
+        self.error_max = 300
+        self.poll_delay = self.poll_min
+        self.error_count = 0
+        self.long_poll = False
         self.log = Log()
         self.total_time = 10
-        self.config_file = os.path.join(os.path.dirname(__file__), 'config/mail_config.yml')
+        # paket isterken gönderilen düğüm bilgisi; koordinatör işi bu bilgilere göre dağıtır.
+        self.node = '%s-%d' % (socket.gethostname(), os.getpid())
+        self.advertise = None
 
-    def get(self, request, json=True):
+    @staticmethod
+    def create_session(pool_size, retries, url=None):
+        # keep-alive bağlantı havuzlu http oturumu. Sadece GET gibi tekrarlanabilir istekler
+        # bağlantı hatalarında otomatik tekrar denenir; gönderimlerin tekrarını send_with_retry yapar.
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=retries, backoff_factor=0.5,
+                                                status_forcelist=(502, 503, 504)))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if url:
+            # requestPkg her yanıtta bir paket verir; yanıtı kaybolan istek tekrarlanırsa ilk paket
+            # sahipsiz kalır. Bu yüzden sadece istek gönderilemeden oluşan bağlantı hataları tekrarlanır.
+            session.mount('%s/requestPkg' % url,
+                          HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                      max_retries=Retry(total=retries, connect=retries, read=0, status=0,
+                                                        other=0, backoff_factor=0.5)))
+        return session
+
+    def get(self, request, json=True, headers=None):
         # Get isteğini işleyip json data dönen fonksiyonumuz.
         try:
-            response = requests.get('%s/%s' % (self.url, request), timeout=(30, 300))
+            response = self.session.get('%s/%s' % (self.url, request), timeout=self.timeout, headers=headers)
             response.raise_for_status()  # HTTP hatalarını yakalamak için
+            self.error_count = 0
+            self.total_error_time = 0
             if json:
-                self.total_error_time = 10
                 return response.json()
             else:
-                self.total_error_time = 10
                 return response
         except requests.exceptions.RequestException as e:
             self.log.error('Sunucuya %s saniyedir erişilemedi tekrar bağlanmaya çalışıyor! Hata: %s' % (self.total_error_time, str(e)), continued=True)
-            self.total_error_time += 10
+            self.error_count += 1
             self.total_time = 10
             return -2
 
+    @staticmethod
+    def backoff(attempt, base, cap):
+        # üssel artan, rastgele sapmalı (jitter) bekleme süresi; böylece çiftlik düştüğünde
+        # tüm gönüllüler aynı anda tekrar bağlanmaya çalışmaz.
+        delay = min(cap, base * (2 ** attempt))
+        return random.uniform(delay / 2.0, delay)
+
+    def error_wait(self):
+        # sunucuya erişilemediğinde hata sayısına göre artan süre bekler.
+        delay = self.backoff(self.error_count - 1, self.time, self.error_max)
+        time.sleep(delay)
+        self.total_error_time += delay
+        self.total_time += delay
+
+    def idle_wait(self, message=''):
+        # kuyrukta paket yokken bekler; her boş yanıtta bekleme süresi poll_max'a kadar iki katına çıkar.
+        if message:
+            information_message = '%d saniye%s' % (self.total_time, message)
+            self.log.information(message=information_message, continued=True)
+        if self.long_poll:
+            return
+        delay = random.uniform(self.poll_delay / 2.0, self.poll_delay)
+        time.sleep(delay)
+        self.total_time += delay
+        self.poll_delay = min(self.poll_max, self.poll_delay * 2)
+
+    def reset_poll(self):
+        # bir iş bitince yeni iş hemen istenir.
+        self.poll_delay = self.poll_min
+        self.total_time = 0
+
    
 
-    def send_file(self, package, binary_path):
+    def clone(self):
+        # aynı ayarlarla ve aynı bağlantı havuzu ile bağımsız bir farm nesnesi (ör: her derleme yuvası için) oluşturur.
+        farm = Farm(self.url, self.email, upload_workers=self.upload_workers, upload_retries=self.upload_retries,
+                    pool_size=self.pool_size, timeout=self.timeout, upload_timeout=self.upload_timeout,
+                    retries=self.retries, session=self.session, log_compression=self.log_compression,
+                    delta_uploads=self.delta_uploads)
+        farm.delta_supported = self.delta_supported
+        farm.node = self.node
+        farm.advertise = self.advertise
+        return farm
+
+    def node_headers(self):
+        # düğümün adı ve (verildiyse) yerel durumu; gerçek çiftlik bu başlıkları yok sayar.
+        headers = {'X-Gonullu-Node': self.node}
+        if self.advertise is not None:
+            headers.update(self.advertise())
+        return headers
+
+    def send_file(self, package, binary_path, exclude=(), files=None):
         # Oluşan çıktı dosyalarını çiftliğe gönderen fonksiyonumuz.
-        output_files = glob.glob('/tmp/gonullu/%s/*.[lpe]*' % package)
+        # exclude: derleme sürerken önceden gönderilmiş olan dosyalar.
+        # files: verilirse sadece bu dosyalar gönderilir (ör: başarısız derlemenin ilgili logları).
+        output_files = glob.glob('/tmp/gonullu/%s/*.[lpe]*' % package) if files is None else list(files)
+        if not output_files and files is not None:
+            # gönderilecek log yok (ör: container log yazamadan durdu).
+            return True
         if not output_files:
             self.log.error('Dosya bulunamadı: /tmp/gonullu/%s/*.[lpe]*' % package)
             return False
 
-        for file in output_files:
-            retry_count = 0
-            while True:  # Sonsuz döngü - dosya gönderilene kadar devam eder
+        output_files = [file for file in output_files if file not in exclude]
+        if not output_files:
+            return True
+
+        # dosyaları sınırlı sayıda işçi ile aynı anda gönderiyoruz.
+        with ThreadPoolExecutor(max_workers=min(self.upload_workers, len(output_files))) as pool:
+            results = list(pool.map(lambda file: self.send_with_retry(file, binary_path), output_files))
+        return all(results)
+
+    def send_with_retry(self, file, binary_path):
+        # dosyayı gönderir, başarısız olursa artan bekleme süreleri ile tekrar dener.
+        for retry_count in range(self.upload_retries):
+            try:
                 if self.send(file, binary_path):
-                    break  # Başarılı olursa döngüden çık
-                else:
-                    retry_count += 1
-                    self.log.warning(message='%s dosyası tekrar gönderilmeye çalışılacak. Deneme: %d' % (file, retry_count + 1), continued=True)
-                    self.wait()
-        # Temizlik kodu kaldırıldı
-        return True
+                    return True
+            except OSError as e:
+                self.log.error(message='%s dosyası okunamadı! Hata: %s' % (file, str(e)))
+
+            if retry_count + 1 < self.upload_retries:
+                delay = self.backoff(retry_count, self.time, self.error_max)
+                self.log.warning(message='%s dosyası %d saniye sonra tekrar gönderilmeye çalışılacak. Deneme: %d' %
+                                         (file, delay, retry_count + 2), continued=True)
+                time.sleep(delay)
+
+        self.log.error(message='%s dosyası %d denemede gönderilemedi!' % (file, self.upload_retries))
+        return False
 
     def send(self, file, binary_path):
+        manifest = None
+        if self.delta_uploads and file.endswith('.pisi'):
+            manifest = chunk_file(file)
+            delta = self.send_delta(file, binary_path, manifest)
+            if delta is not None:
+                return delta
+
         self.log.information(message='%s dosyası gönderiliyor.' % file.split('/')[-1])
+        fileobj = filename = size = None
         if file.split('.')[-1] in ('err', 'log'):
-            with open(file, 'r') as f:
-                content = f.read()
-            with open('%s.html' % file, 'w') as html:
-                html.write('<html><body><pre>')
-                html.write(content)
-                html.write('</pre></body></html>')
-            file = '%s.html' % file
+            # log dosyaları diske ikinci bir kopya yazılmadan, parça parça html'e
+            # çevrilip (istenirse sıkıştırılarak) gönderilir.
+            filename, fileobj, size = log_body(file, self.log_compression)
 
         try:
-            with open(file, 'rb') as f:
-                files = {'file': f}
+            # dosya diskten bir kez okunur; gönderilirken sha1 özeti de hesaplanır.
+            with MultipartFile(file, {'binrepopath': binary_path}, fileobj=fileobj, filename=filename,
+                               size=size) as body:
+                started = time.time()
                 # Timeout değerlerini artırıyoruz: (bağlantı timeout, okuma timeout)
-                r = requests.post('%s/%s' % (self.url, 'upload'), 
-                                files=files, 
-                                data={'binrepopath': binary_path},
-                                timeout=(60, 600))  # 30 saniye bağlantı, 300 saniye okuma timeout
+                r = self.session.post('%s/%s' % (self.url, 'upload'),
+                                      data=body,
+                                      headers={'Content-Type': body.content_type},
+                                      timeout=self.upload_timeout)
                 r.raise_for_status()
-                hashx = self.sha1file(file)
+                hashx = body.hexdigest()
 
-                file = file.split('/')[-1]
+                path, file = file, filename or file.split('/')[-1]
                 if hashx == r.text.strip():
+                    # yeniden başlatmada tekrar gönderilmemesi için iş günlüğüne yazıyoruz.
+                    journal.uploaded(path, hashx)
+                    if manifest is not None:
+                        records.remember(path, manifest)
+                    elapsed = max(time.time() - started, 1e-6)
+                    metrics.inc('gonullu_upload_bytes_total', len(body))
+                    metrics.inc('gonullu_upload_files_total')
+                    metrics.observe('gonullu_upload_seconds', elapsed)
+                    metrics.set('gonullu_upload_throughput_bytes_per_second', len(body) / elapsed)
                     self.log.success(message='%s dosyası başarı ile gönderildi.' % file)
                     return True
                 else:
@@ -91,44 +288,118 @@ class Farm:
             self.log.error(message='%s dosyası gönderilemedi! Hata: %s' % (file, str(e)))
             return False
 
-    def get_package(self):
-        # Mail adresini kontrol et
-        if not os.path.exists(self.config_file):
-            # Yapılandırma dosyası yoksa oluştur
-            config = {'email': None, 'is_verified': False}
-            with open(self.config_file, 'w') as f:
-                yaml.dump(config, f)
+    def send_delta(self, file, binary_path, manifest):
+        # dosyanın sadece bu paketin son gönderiminde olmayan parçalarını gönderip çiftlikte
+        # birleştirir; çiftlik dosyanın tamamının sha1 özetini doğrular. Önceki gönderim kaydı
+        # yoksa, çiftlik desteklemiyorsa ya da birleştirme olmazsa None döner ve dosya tam gönderilir.
+        previous = records.load(file)
+        if previous is None or not self.delta_supported:
+            return None
+        name = file.split('/')[-1]
+        known = set(chunk[0] for chunk in previous['chunks'])
+        missing = set(chunk[0] for chunk in manifest['chunks'] if chunk[0] not in known)
+        started = time.time()
+        sent = 0
+        try:
+            for _ in range(2):
+                self.log.information(message='%s dosyasının %d parçası gönderiliyor.' % (name, len(missing)))
+                sent += self.send_chunks(file, manifest, missing)
+                r = self.session.post('%s/%s' % (self.url, 'delta/assemble'),
+                                      json={'binrepopath': binary_path, 'filename': name, 'sha1': manifest['sha1'],
+                                            'size': manifest['size'],
+                                            'chunks': [chunk[0] for chunk in manifest['chunks']]},
+                                      timeout=self.upload_timeout)
+                if r.status_code == 404:
+                    raise DeltaUnsupported()
+                if r.status_code != 409:
+                    r.raise_for_status()
+                    break
+                # çiftlikte bulunmayan parçalar (ör: önceki sürüm silinmiş) bir kez daha gönderilir.
+                missing = set(r.json().get('missing', []))
+            else:
+                return None
+        except DeltaUnsupported:
+            self.log.warning(message='Çiftlik fark gönderimini desteklemiyor, dosyalar tam gönderilecek.')
+            self.delta_supported = False
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log.warning(message='%s dosyası fark olarak gönderilemedi, tam gönderilecek. Hata: %s' % (name, str(e)))
+            return None
+
+        if r.text.strip() != manifest['sha1']:
+            self.log.error(message='%s dosyası çiftlikte doğru birleştirilemedi, tam gönderilecek.' % name)
+            return None
+        journal.uploaded(file, manifest['sha1'])
+        records.remember(file, manifest)
+        elapsed = max(time.time() - started, 1e-6)
+        metrics.inc('gonullu_upload_bytes_total', sent)
+        metrics.inc('gonullu_upload_files_total')
+        metrics.inc('gonullu_upload_delta_saved_bytes_total', manifest['size'] - sent)
+        metrics.observe('gonullu_upload_seconds', elapsed)
+        metrics.set('gonullu_upload_throughput_bytes_per_second', sent / elapsed)
+        self.log.success(message='%s dosyası fark olarak gönderildi (%d/%d byte).' % (name, sent, manifest['size']))
+        return True
 
-        # Yapılandırma dosyasını oku
-        with open(self.config_file, 'r') as f:
-            config = yaml.safe_load(f)
+    def send_chunks(self, file, manifest, missing, batch_size=8 << 20):
+        # istenen parçaları dosyadan okuyup en fazla batch_size büyüklüğünde paketler halinde
+        # gönderir. Her paketteki parçaların özet ve boyutları X-Gonullu-Chunks başlığındadır.
+        wanted = set(missing)
+        chunks = []
+        offset = 0
+        for digest, length in manifest['chunks']:
+            if digest in wanted:
+                # aynı parça dosyada birden fazla geçiyorsa bir kez gönderilir.
+                wanted.discard(digest)
+                chunks.append((digest, offset, length))
+            offset += length
 
+        sent = 0
+        batch = []
+        size = 0
+        with open(file, 'rb') as f:
+            for index, (digest, offset, length) in enumerate(chunks):
+                f.seek(offset)
+                batch.append((digest, f.read(length)))
+                size += length
+                if index + 1 < len(chunks) and size < batch_size and len(batch) < 64:
+                    continue
+                r = self.session.post('%s/%s' % (self.url, 'delta/chunks'),
+                                      data=b''.join(data for _, data in batch),
+                                      headers={'Content-Type': 'application/octet-stream',
+                                               'X-Gonullu-Chunks': ','.join('%s:%d' % (digest, len(data))
+                                                                            for digest, data in batch)},
+                                      timeout=self.upload_timeout)
+                if r.status_code == 404:
+                    raise DeltaUnsupported()
+                r.raise_for_status()
+                sent += size
+                batch = []
+                size = 0
+        return sent
+
+    def get_package(self):
+        # Mail adresini kontrol et, yapılandırma dosyası sadece değiştiğinde yeniden okunur.
+        config = mail_config()
+
+        # wait parametresini destekleyen çiftlik, yeni paket gelene kadar isteği bekletir (long-poll).
+        request = '%s/%s?wait=%d' % ('requestPkg', self.email, self.poll_max)
         # Eğer mail adresi doğrulanmışsa ve aynı mail adresi kullanılıyorsa
         if config.get('is_verified') and config.get('email') == self.email:
-            request = '%s/%s' % ('requestPkg', self.email)
-            response = self.get(request)
+            response = self.request_package(request)
         else:
             # Mail adresini doğrula
-            request = '%s/%s' % ('requestPkg', self.email)
-            response = self.get(request)
+            response = self.request_package(request)
 
             if response == -2:
-                time.sleep(self.time)
-                self.total_time += self.time
+                self.error_wait()
                 return -2
 
             if response['state'] == 200:
                 # Mail adresi doğrulandı, yapılandırma dosyasını güncelle
-                config['email'] = self.email
-                config['is_verified'] = True
-                with open(self.config_file, 'w') as f:
-                    yaml.dump(config, f)
+                save_mail_config(self.email, True)
                 self.log.success('Mail adresi başarıyla doğrulandı.')
             elif response['state'] == 402:
-                config['email'] = self.email
-                config['is_verified'] = True
-                with open(self.config_file, 'w') as f:
-                    yaml.dump(config, f)
+                save_mail_config(self.email, True)
                 self.log.success('Mail adresi başarıyla doğrul"andı.')
             elif response['state'] == 401:
                 self.log.error(message='Mail adresiniz yetkili değil!')
@@ -141,8 +412,7 @@ class Farm:
             return -1
 
         if response == -2:
-            time.sleep(self.time)
-            self.total_time += self.time
+            self.error_wait()
             return -2
 
         if not isinstance(response, dict):
@@ -169,14 +439,29 @@ class Farm:
             self.log.error(message='Tanımlı olmayan bir hata oluştu!')
             self.log.get_exit()
 
-    def wait(self, message='', reset=False):
+    def request_package(self, request):
+        # paket isteğini yapar ve çiftliğin long-poll desteği olup olmadığını yanıttan öğrenir.
+        response = self.get(request, json=False, headers=self.node_headers())
+        if response == -2:
+            return -2
+        self.long_poll = response.headers.get('X-Long-Poll', '').lower() in ('1', 'true', 'yes')
+        try:
+            return response.json()
+        except ValueError:
+            self.log.error(message='Geçersiz yanıt alındı!')
+            return -2
+
+    def wait(self, message='', reset=False, sleep=True):
+        # sleep=False ise süre zaten başka bir yerde (ör: docker wait) beklenmiştir,
+        # burada sadece mesajı yazıp sayacı ilerletiyoruz.
         if reset:
             self.total_time = 0
 
         if message:
             information_message = '%d saniye%s' % (self.total_time, message)
             self.log.information(message=information_message, continued=True)
-        time.sleep(self.time)
+        if sleep:
+            time.sleep(self.time)
         self.total_time += self.time
 
     def get_total_time(self):
@@ -193,7 +478,6 @@ class Farm:
 
     @staticmethod
     def sha1file(filepath):
-        import hashlib
         sha = hashlib.sha1()
         with open(filepath, 'rb') as f:
             while True:
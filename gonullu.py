@@ -4,11 +4,20 @@ import os
 import signal
 import sys
 import traceback
-import yaml
-import shutil
+from admission import MemoryAdmission
+from cache import PackageCache
+from config import mail_config
 from log import Log
+from logstream import zstandard
+from metrics import start_server
 from farm import Farm
+from history import history
+from image import ImageCache
+from journal import journal
 from volunteer import Volunteer
+from scheduler import Scheduler
+from worker import Worker
+from workspace import Workspace
 
 
 
@@ -16,59 +25,57 @@ def usage():
     print("""
 Kullanim - Usage
 Asagidaki satir, docker icindeki /etc/pisi/pisi.conf icinde bulunan
--j parametresini verecegimiz rakam ile degistirir.
+-j parametresini verecegimiz rakam ile degistirir. Verilmezse -j degeri
+container'a ayrilan islemci ve hafizaya gore hesaplanir.
 \tsudo gonullu -j 24
 Asagidaki satir, docker icin islemcinin %70'ini, fiziksel hafizanin
-%25'ini  ayirir.
+%25'ini  ayirir. Islemciler fiziksel cekirdek ve NUMA dugumu gozetilerek
+container'a sabitlenir.
 \tsudo gonullu --cpu=70 --memory=25
+Asagidaki satir, ayni anda 4 paket derleyen 4 bagimsiz derleme yuvasi
+acar. Islemciler ve hafiza yuvalar arasinda paylastirilir. --slots=0
+verilirse yuva sayisi derleme gecmisindeki bellek kullanimina gore secilir.
+\tsudo gonullu --slots=4
+Asagidaki satir, bir paketin ciktilari gonderilirken siradaki paketi
+alip derlemeye baslar.
+\tsudo gonullu --pipeline
+Asagidaki satir, derleme araclari ve depo indeksleri onceden kurulmus
+yerel bir imaj hazirlar ve derlemeleri bu imajdan baslatir.
+\tsudo gonullu --warm
+Asagidaki satir, /var/cache/pisi altindaki paket ve kaynak arsivi
+onbellegini en fazla 10240 MB ile sinirlar (0: sinirsiz).
+\tsudo gonullu --cache-size=10240
+Asagidaki satir, derleme sirasinda kullanilan /var/pisi dizinini
+bellekte (tmpfs) tutar; --scratch ile ayri bir disk de verilebilir.
+tmpfs en fazla --tmpfs-size MB (varsayilan 4096) buyur ve bu boyut
+derlemenin bellek sinirina eklenir.
+\tsudo gonullu --workspace=tmpfs --tmpfs-size=8192
+Asagidaki satir, her paket icin en fazla 5G'lik bir ccache onbellegi
+kullanir; --ccache-total ile tum paketler icin MB cinsinden sinir verilir.
+\tsudo gonullu --ccache=5G --ccache-total=51200
+Asagidaki satir, derleme asamalarinin sureleri ve kaynak kullanimini
+http://127.0.0.1:9100/metrics adresinden Prometheus bicimde sunar.
+\tsudo gonullu --metrics-port=9100
+Asagidaki satir, .pisi dosyalarinin sadece paketin bir onceki gonderiminden
+farkli olan parcalarini gonderir; ciftlik desteklemiyorsa dosyalar tam gonderilir.
+\tsudo gonullu --delta-upload
+Asagidaki satir, gonulluyu yerel sahte ciftlige (python3 mockfarm.py)
+baglar; docker olmadan uctan uca olcum icin python3 benchmark.py kullanin.
+\tsudo gonullu --farm=http://127.0.0.1:8080
+Birden fazla makine, ciftlige tek baglanti kuran bir koordinator
+(python3 coordinator.py) uzerinden de calistirilabilir.
+\tsudo gonullu --farm=http://koordinator:8080
 """)
     sys.exit()
 
 
 def get_saved_email():
-    config_file = os.path.join(os.path.dirname(__file__), 'config/mail_config.yml')
-    if os.path.exists(config_file):
-        with open(config_file, 'r') as f:
-            config = yaml.safe_load(f)
-            if config and config.get('is_verified'):
-                return config.get('email')
+    config = mail_config()
+    if config.get('is_verified'):
+        return config.get('email')
     return None
 
 
-def main(log_main, volunteer_main, farm_main):
-    while 1:
-        response = farm_main.get_package()
-        if (response == -1) or (response ==  -2):
-            if response == -1:
-                farm_main.wait(message='dir yeni paket bekleniyor.')
-        else:
-            volunteer_main.get_package_farm(response)
-            while 1:
-                if volunteer_main.check():
-                    # container bulunamadı. İşlem bitti.
-                    if farm_main.send_file(response['package'], response['binary_repo_dir']):
-                        success = int(open('/tmp/gonullu/%s/%s.bitti' % (response['package'],
-                                                                         response['package']), 'r').read())
-                        farm_main.get('updaterunning?id=%s&state=%s' % (response['queue_id'], success), json=False)
-                        volunteer_main.remove()
-                        log_main.success(
-                            message='derleme işlemi %s paketi için %s saniyede bitti.' % (response['package'],
-                                                                                          farm_main.get_total_time())
-                        )
-                        log_main.blank_line()
-                        farm_main.wait(reset=True)
-                        # Tüm işlemler bittikten sonra /tmp/gonullu dizinini temizle
-                        try:
-                            shutil.rmtree('/tmp/gonullu', ignore_errors=True)
-                            log_main.success('/tmp/gonullu dizini temizlendi.')
-                        except Exception as e:
-                            log_main.warning('Temizlik sırasında hata: %s' % str(e))
-                    break
-                else:
-                    # container bulundu. İşlem sürüyor.
-                    farm_main.wait(message='den beri derleme işlemi %s paketi için devam ediyor.' % response['package'])
-
-
 if __name__ == "__main__":
     log = Log()
     
@@ -78,7 +85,12 @@ if __name__ == "__main__":
     # Sinyal yönetimini ayarla
     def signal_handler(signum, frame):
         print("\nProgram sonlandırılıyor...")
-        if global_volunteer:
+        if global_volunteer and signum == signal.SIGTERM:
+            # servis yeniden başlatılıyor ya da sistem kapanıyor: derlemeler sürer,
+            # program tekrar açıldığında iş günlüğünden kaldıkları yerden devam edilir.
+            global_volunteer.detach()
+            log.information("Çalışan derlemeler bir sonraki açılışta sürdürülecek.")
+        elif global_volunteer:
             try:
                 log.information("Çalışan Docker container'ı durduruluyor...")
                 global_volunteer.remove()
@@ -93,9 +105,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='This is pisilinux volunteer application')
     parser.add_argument('-k', '--kullanim', action="store_true", dest='usage', default=False)
     parser.add_argument('-m', '--memory', action='store', dest='memory_limit', default=50, type=int)
-    parser.add_argument('-c', '--cpu', action='store', dest='cpu_set', default=1, type=int)
+    parser.add_argument('-c', '--cpu', action='store', dest='cpu_set', default=100, type=int)
     parser.add_argument('-e', '--email', action='store', dest='email', default=None, type=str)
-    parser.add_argument('-j', '--job', action='store', dest='job', default=5, type=int)
+    parser.add_argument('-j', '--job', action='store', dest='job', default=None, type=int)
+    parser.add_argument('-s', '--slots', action='store', dest='slots', default=1, type=int)
+    parser.add_argument('-p', '--pipeline', action='store_true', dest='pipeline', default=False)
+    parser.add_argument('-w', '--warm', action='store_true', dest='warm', default=False)
+    parser.add_argument('--cache-size', action='store', dest='cache_size', default=20480, type=int)
+    parser.add_argument('--ccache', action='store', dest='ccache', default=None, type=str)
+    parser.add_argument('--ccache-total', action='store', dest='ccache_total', default=0, type=int)
+    parser.add_argument('--workspace', action='store', dest='workspace', default='dir', choices=['dir', 'tmpfs'])
+    parser.add_argument('--scratch', action='store', dest='scratch', default='/tmp/varpisi', type=str)
+    parser.add_argument('--tmpfs-size', action='store', dest='tmpfs_size', default=4096, type=int)
+    parser.add_argument('--image-ttl', action='store', dest='image_ttl', default=3600, type=int)
+    parser.add_argument('-u', '--upload-workers', action='store', dest='upload_workers', default=4, type=int)
+    parser.add_argument('--log-compression', action='store', dest='log_compression', default='none',
+                        choices=['none', 'gzip', 'zstd'])
+    parser.add_argument('--delta-upload', action='store_true', dest='delta_upload', default=False)
+    parser.add_argument('--metrics-port', action='store', dest='metrics_port', default=0, type=int)
+    parser.add_argument('--farm', action='store', dest='farm', default='http://31.207.82.178', type=str)
+    parser.add_argument('--farm-pool', action='store', dest='farm_pool', default=10, type=int)
+    parser.add_argument('--farm-timeout', action='store', dest='farm_timeout', default=30, type=int)
+    parser.add_argument('--farm-retries', action='store', dest='farm_retries', default=3, type=int)
 
     args = parser.parse_args()
 
@@ -106,6 +137,10 @@ if __name__ == "__main__":
         log.error('Lütfen programı yönetici(sudo) olarak çalıştırınız.')
         log.get_exit()
 
+    if args.log_compression == 'zstd' and zstandard is None:
+        log.error('zstd sıkıştırması için zstandard python modülünü kurunuz.')
+        log.get_exit()
+
     docker_socket_file = '/var/run/docker.sock'
     if not os.path.exists(docker_socket_file):
         log.error(message='Lütfen ilk önce docker servisini çalıştırınız!')
@@ -126,16 +161,48 @@ if __name__ == "__main__":
         args.email = saved_email
         log.information(f'Kayıtlı mail adresi kullanılıyor: {saved_email}')
 
+    if args.slots < 1:
+        # yuva sayısı verilmediyse son derlemelerin bellek kullanımına göre tahmin ediyoruz.
+        args.slots = history.suggest_slots(MemoryAdmission(args.memory_limit).budget,
+                                           max(1, (os.cpu_count() or 1) * args.cpu_set // 100))
+        log.information('Derleme geçmişine göre %d yuva kullanılacak.' % args.slots)
 
     #farm = Farm('https://ciftlik.pisilinux.org/ciftlik', args.email)
-    farm = Farm('http://31.207.82.178', args.email)
-    volunteer = Volunteer(args)
+    # bağlantı havuzu en az aynı anda yapılabilecek gönderim sayısı kadar olmalı.
+    farm = Farm(args.farm.rstrip('/'), args.email, upload_workers=args.upload_workers,
+                pool_size=max(args.farm_pool, args.upload_workers * args.slots + args.slots),
+                timeout=(args.farm_timeout, 300), upload_timeout=(args.farm_timeout, 600), retries=args.farm_retries,
+                log_compression=None if args.log_compression == 'none' else args.log_compression,
+                delta_uploads=args.delta_upload)
+
+    # çiftlik ya da koordinatör önbelleğe denk gelen işleri seçebilsin diye yerel imajları ve
+    # kaynak arşivleri önbellekte duran paketleri bildiriyoruz.
+    farm.advertise = lambda: {'X-Gonullu-Images': ','.join(ImageCache.local_images()),
+                              'X-Gonullu-Warm': ','.join(PackageCache.warm_packages())}
 
     try:
-        shutil.rmtree('/tmp/gonullu', ignore_errors=True)
+        # yarım kalan işlerin çıktı dizinleri korunur, diğer artıklar temizlenir.
+        pending = journal.pending()
+        Workspace.clean(keep=[entry['package'] for entry in pending])
+        Workspace.purge('/tmp/gonullu', args.scratch)
+        if pending:
+            log.information('%d yarım kalan iş sürdürülecek.' % len(pending))
+        if args.metrics_port:
+            # derleme aşama süreleri ve kaynak kullanımı http://127.0.0.1:<port>/metrics adresinde.
+            start_server(args.metrics_port)
         os.system("stty -echo")
-        global_volunteer = volunteer
-        main(log, volunteer, farm)
+        if args.slots > 1:
+            scheduler = Scheduler(args, farm, log)
+            scheduler.resume(pending)
+            global_volunteer = scheduler
+            scheduler.run()
+        else:
+            # pipeline modunda sıradaki paket için ikinci bir volunteer hazır bekler.
+            worker = Worker(Volunteer(args), farm, log, Volunteer(args) if args.pipeline else None,
+                            MemoryAdmission(args.memory_limit))
+            worker.pending = pending
+            global_volunteer = worker
+            worker.run()
     except SystemExit as e:
         # Program düzgün şekilde sonlandırıldı
         if e.code == 0:
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import STATE_DIRECTORY
+from log import Log
+
+
+HISTORY_DATABASE = os.path.join(STATE_DIRECTORY, 'history.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue_id TEXT,
+    package TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL,
+    exit_code INTEGER,
+    status INTEGER,
+    failure TEXT,
+    oom_killed INTEGER DEFAULT 0,
+    memory_limit INTEGER,
+    jobs INTEGER,
+    peak_memory INTEGER,
+    cpu_seconds REAL,
+    io_bytes INTEGER,
+    artifact_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS builds_package ON builds (package, started);
+CREATE TABLE IF NOT EXISTS stages (
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_build ON stages (build_id);
+"""
+
+
+class BuildHistory:
+    # paketlerin derleme geçmişini (aşama süreleri, en yüksek bellek, işlemci süresi,
+    # çıktı boyutu ve .bitti'deki sonuç) tutan sqlite veritabanımız. Bellek sınırı,
+    # -j ve yuva sayısı gibi kararlar buradaki tahminlerle verilir.
+    def __init__(self, path=HISTORY_DATABASE, samples=5):
+        # samples: tahminde kullanılan son başarılı derleme sayısı.
+        self.path = path
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.connection = None
+        self.log = Log()
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA foreign_keys=ON')
+            self.connection.executescript(SCHEMA)
+            # failure sütunu sonradan eklendi, eski veritabanlarına ekliyoruz.
+            columns = [row['name'] for row in self.connection.execute('PRAGMA table_info(builds)')]
+            if 'failure' not in columns:
+                self.connection.execute('ALTER TABLE builds ADD COLUMN failure TEXT')
+        return self.connection
+
+    def query(self, sql, parameters=()):
+        try:
+            with self.lock:
+                return [dict(row) for row in self.connect().execute(sql, parameters).fetchall()]
+        except sqlite3.Error as e:
+            self.log.warning('Derleme geçmişi okunamadı: %s' % str(e))
+            return []
+
+    def add(self, summary):
+        # BuildMetrics.summary() çıktısını kaydeder.
+        try:
+            with self.lock, self.connect() as connection:
+                cursor = connection.execute(
+                    'INSERT INTO builds (queue_id, package, started, duration, exit_code, status, failure, '
+                    'oom_killed, memory_limit, jobs, peak_memory, cpu_seconds, io_bytes, artifact_bytes) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (str(summary['queue_id']), summary['package'], summary['started'], summary['duration'],
+                     summary['exit_code'], summary.get('status'), summary.get('failure'),
+                     int(bool(summary.get('oom_killed'))),
+                     summary.get('memory_limit'), summary.get('jobs'), summary['peak_memory'],
+                     summary['cpu_seconds'], summary['io_bytes'], summary['artifact_bytes']))
+                connection.executemany('INSERT INTO stages (build_id, stage, seconds) VALUES (?, ?, ?)',
+                                       [(cursor.lastrowid, stage, seconds)
+                                        for stage, seconds in summary['stages'].items()])
+        except sqlite3.Error as e:
+            self.log.warning('%s paketinin derleme geçmişi kaydedilemedi: %s' % (summary['package'], str(e)))
+
+    def builds(self, package, limit=10):
+        # paketin en yeni derlemeleri, aşama süreleri ile birlikte.
+        builds = self.query('SELECT * FROM builds WHERE package = ? ORDER BY started DESC LIMIT ?', (package, limit))
+        for build in builds:
+            build['stages'] = {row['stage']: row['seconds'] for row in
+                               self.query('SELECT stage, seconds FROM stages WHERE build_id = ?', (build['id'],))}
+        return builds
+
+    def predict(self, package):
+        # paketin bir sonraki derlemesi için beklenen değerler, geçmişi yoksa None.
+        # süreler son başarılı derlemelerin yeniden eskiye ağırlıklı ortalaması, bellek ise en yükseği.
+        builds = self.query('SELECT * FROM builds WHERE package = ? ORDER BY started DESC LIMIT ?',
+                            (package, self.samples * 2))
+        if not builds:
+            return None
+        last = builds[0]
+        successful = [build for build in builds if build['status'] == 0 and not build['oom_killed']]
+        samples = (successful or builds)[:self.samples]
+        weights = [0.5 ** index for index in range(len(samples))]
+
+        def average(key):
+            values = [(build[key] or 0, weight) for build, weight in zip(samples, weights)]
+            return sum(value * weight for value, weight in values) / sum(weights)
+
+        peak = max(build['peak_memory'] or 0 for build in samples)
+        jobs = [build for build in samples if build['jobs'] and build['peak_memory']]
+        return {
+            'samples': len(samples),
+            'duration': average('duration'),
+            'cpu_seconds': average('cpu_seconds'),
+            'artifact_bytes': average('artifact_bytes'),
+            'peak_memory': peak,
+            # -j başına düşen bellek (byte); -j hesabında sabit tahmin yerine kullanılır.
+            'memory_per_job': max(build['peak_memory'] / build['jobs'] for build in jobs) if jobs else None,
+            'oom_killed': bool(last['oom_killed']),
+            'memory_limit': last['memory_limit'],
+            'failure_rate': 1 - len(successful) / float(len(builds)),
+        }
+
+    def typical_peak(self, since=30 * 86400, limit=200):
+        # son derlemelerin en yüksek bellek kullanımlarının ortancası (byte), geçmiş yoksa None.
+        rows = self.query('SELECT peak_memory FROM builds WHERE started > ? AND peak_memory > 0 '
+                          'ORDER BY started DESC LIMIT ?', (time.time() - since, limit))
+        if not rows:
+            return None
+        peaks = sorted(row['peak_memory'] for row in rows)
+        return peaks[len(peaks) // 2]
+
+    def suggest_slots(self, budget_mb, cpus, margin=1.5):
+        # bellek bütçesine ve işlemci sayısına göre kaç derlemenin aynı anda sığacağını tahmin eder.
+        peak = self.typical_peak()
+        if not peak:
+            return 1
+        slots = int(budget_mb // max(1, (peak >> 20) * margin))
+        return max(1, min(slots, int(cpus) // 2))
+
+
+history = BuildHistory()
+
+
+if __name__ == '__main__':
+    # geçmişi sorgulamak için: python3 history.py <paket>
+    parser = argparse.ArgumentParser()
+    parser.add_argument('package', nargs='?', default=None)
+    parser.add_argument('-n', '--limit', action='store', dest='limit', default=10, type=int)
+    args = parser.parse_args()
+
+    if args.package:
+        print(json.dumps({'prediction': history.predict(args.package),
+                          'builds': history.builds(args.package, args.limit)}, indent=2))
+    else:
+        print(json.dumps(history.query('SELECT package, COUNT(*) AS builds, AVG(duration) AS duration, '
+                                       'MAX(peak_memory) AS peak_memory, MAX(started) AS last '
+                                       'FROM builds GROUP BY package ORDER BY last DESC LIMIT ?',
+                                       (args.limit,)), indent=2))
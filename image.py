@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from docker.errors import NotFound
+
+from log import Log
+
+
+# derlemeden önce her container'da kurulan araç zinciri paketleri.
+TOOLCHAIN = 'autoconf autogen automake binutils bison flex gawk gc gcc gnuconfig guile libmpc libsigsegv libtool-ltdl ' \
+            'libtool lzo m4 make mpfr nasm pkgconfig yacc glibc-devel isl'
+
+# depoları ekleyip araç zincirini kuran hazırlık satırları.
+SETUP_COMMANDS = """service dbus start && pisi cp && update-ca-certificates && pisi ar pisiBeta https://beta.pisilinux.org/pisi-index.xml.xz && pisi it --ignore-safety --ignore-dependency %s%s
+pisi ar core --ignore-check https://github.com/pisilinux/core/raw/master/pisi-index.xml.xz && pisi ar main --ignore-check https://github.com/pisilinux/main/raw/master/pisi-index.xml.xz --at 2
+pisi ur
+"""
+
+# depo indekslerinin değişip değişmediğini anlamak için okuduğumuz özet dosyaları.
+INDEX_SHA1_URLS = [
+    'https://beta.pisilinux.org/pisi-index.xml.xz.sha1sum',
+    'https://github.com/pisilinux/core/raw/master/pisi-index.xml.xz.sha1sum',
+    'https://github.com/pisilinux/main/raw/master/pisi-index.xml.xz.sha1sum',
+]
+
+WARM_REPOSITORY = 'gonullu-warm'
+
+
+class ImageCache:
+    # imajların en son ne zaman doğrulandığını tutup her derlemede registry'ye
+    # gitmeyi engelleyen önbelleğimiz. Durum tüm yuvalar arasında ortaktır.
+    # lock sadece durumu korur ve ağ çağrıları sırasında tutulmaz; aynı imajın iki kez
+    # çekilmemesi imaja özel pull kilitleri ile sağlanır.
+    lock = threading.Lock()
+    checked = {}
+    refreshing = set()
+    pulls = {}
+
+    def __init__(self, my_client, ttl=3600):
+        self.my_client = my_client
+        self.ttl = ttl
+        self.log = Log()
+
+    def local_digests(self, image):
+        # imaj yerelde yoksa None, varsa registry özetlerinin listesini döner.
+        try:
+            return self.my_client.inspect_image(image).get('RepoDigests') or []
+        except NotFound:
+            return None
+
+    def remote_digest(self, image):
+        # imajı çekmeden registry'deki güncel özetini öğreniriz.
+        try:
+            return self.my_client.inspect_distribution(image)['Descriptor']['digest']
+        except Exception:
+            return None
+
+    def is_current(self, image, use_ttl=True):
+        local = self.local_digests(image)
+        if local is None:
+            return False
+        if use_ttl and time.time() - self.checked.get(image, 0) < self.ttl:
+            return True
+        remote = self.remote_digest(image)
+        if remote and any(digest.endswith('@%s' % remote) for digest in local):
+            self.checked[image] = time.time()
+            return True
+        return False
+
+    def pull(self, image):
+        tmp_status = False
+        message = '%s imajı güncelleniyor' % image
+        for line in self.my_client.pull(image, stream=True):
+            line = json.loads(line.decode('UTF-8'))
+            if line.get('status') == 'Downloading':
+                if tmp_status is False:
+                    self.log.information(message=message)
+                    tmp_status = True
+                print('  %s' % line.get('progress', ''), end='\r')
+            elif 'error' in line:
+                raise RuntimeError(line['error'])
+
+        if tmp_status is True:
+            print('')
+            self.log.information(message='İmaj son sürüme güncellendi')
+        self.checked[image] = time.time()
+
+    @classmethod
+    def pull_lock(cls, image):
+        with cls.lock:
+            return cls.pulls.setdefault(image, threading.Lock())
+
+    def ensure(self, image):
+        # imaj güncelse hiç beklemeden (arka plandaki pull'u da beklemeden) döner, değilse çeker.
+        if self.is_current(image):
+            return
+        with self.pull_lock(image):
+            if self.is_current(image):
+                return
+            try:
+                self.pull(image)
+            except Exception as e:
+                if self.local_digests(image) is None:
+                    raise
+                self.log.warning('%s imajı güncellenemedi, yerel imaj kullanılacak: %s' % (image, str(e)))
+
+    @classmethod
+    def local_images(cls):
+        # bu süreçte yerelde güncel olduğu doğrulanmış imajlar.
+        with cls.lock:
+            return sorted(list(cls.checked))
+
+    def refresh_async(self, image):
+        # derlemeler arasında imajı arka planda kontrol edip gerekirse günceller.
+        with self.lock:
+            if image in self.refreshing:
+                return
+            self.refreshing.add(image)
+        threading.Thread(target=self._refresh, args=(image,), name='gonullu-pull', daemon=True).start()
+
+    def _refresh(self, image):
+        pull_lock = self.pull_lock(image)
+        try:
+            if not self.is_current(image, use_ttl=False):
+                # imaj zaten bir derleme için çekiliyorsa ikinci kez çekmiyoruz.
+                if pull_lock.acquire(blocking=False):
+                    try:
+                        self.pull(image)
+                    finally:
+                        pull_lock.release()
+        except Exception as e:
+            self.log.warning('%s imajı arka planda güncellenemedi: %s' % (image, str(e)))
+        finally:
+            with self.lock:
+                self.refreshing.discard(image)
+
+
+class WarmImage:
+    # farm'ın verdiği imajdan, araç zinciri ve depo indeksleri hazır olan yerel bir imaj
+    # üretip saklayan sınıfımız. Yerel imaj sadece temel imaj ya da indeksler değişince yenilenir.
+    # lock sadece imaj hazırlanırken tutulur; indeks anahtarı ttl süresince önbellekte
+    # tutulur ve süresi dolunca derlemeyi bekletmeden arka planda yenilenir.
+    lock = threading.Lock()
+    index_lock = threading.Lock()
+    index = {'key': None, 'checked': 0, 'refreshing': False}
+
+    def __init__(self, my_client, ttl=3600):
+        self.my_client = my_client
+        self.ttl = ttl
+        self.image_cache = ImageCache(my_client, ttl)
+        self.log = Log()
+
+    @staticmethod
+    def tag_for(base_image):
+        # temel imaj adından geçerli bir docker etiketi üretir.
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', base_image)[-128:]
+
+    def index_key(self):
+        # depo indekslerinin sha1 özetlerinden tek bir anahtar üretir, erişilemezse None döner.
+        sha = hashlib.sha1()
+        for url in INDEX_SHA1_URLS:
+            try:
+                r = requests.get(url, timeout=(30, 60))
+                r.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                self.log.warning('%s indeks özeti alınamadı: %s' % (url, str(e)))
+                return None
+            sha.update(r.content.strip())
+        return sha.hexdigest()
+
+    def cached_index_key(self):
+        # önbellekteki indeks anahtarı. İlk seferde beklenerek alınır, sonrasında süresi
+        # dolmuşsa eskisi dönülür ve yenisi arka planda alınır.
+        with self.index_lock:
+            if not self.index['checked']:
+                self.index['key'] = self.index_key()
+                self.index['checked'] = time.time()
+                return self.index['key']
+            if time.time() - self.index['checked'] >= self.ttl and not self.index['refreshing']:
+                self.index['refreshing'] = True
+                threading.Thread(target=self.refresh_index_key, name='gonullu-index', daemon=True).start()
+            return self.index['key']
+
+    def refresh_index_key(self):
+        key = self.index_key()
+        with self.index_lock:
+            # indekslere ulaşılamadıysa eski anahtarla devam edilir.
+            if key is not None:
+                self.index['key'] = key
+            self.index['checked'] = time.time()
+            self.index['refreshing'] = False
+
+    def labels(self, image):
+        try:
+            return self.my_client.inspect_image(image)['Config'].get('Labels') or {}
+        except NotFound:
+            return None
+
+    def ensure(self, base_image):
+        # kullanılacak ısıtılmış imajın adını döner, gerekirse önce onu oluşturur.
+        warm_image = '%s:%s' % (WARM_REPOSITORY, self.tag_for(base_image))
+        self.image_cache.ensure(base_image)
+        base_id = self.my_client.inspect_image(base_image)['Id']
+        index_key = self.cached_index_key()
+        if self.is_fresh(warm_image, base_id, index_key):
+            return warm_image
+
+        with self.lock:
+            # beklerken başka bir yuva imajı hazırlamış olabilir.
+            if not self.is_fresh(warm_image, base_id, index_key):
+                self.build(base_image, warm_image, base_id, index_key or 'unknown')
+            return warm_image
+
+    def is_fresh(self, warm_image, base_id, index_key):
+        labels = self.labels(warm_image)
+        if labels is None or labels.get('gonullu.base') != base_id:
+            return False
+        # indekslere ulaşamadıysak elimizdeki imajla devam ediyoruz.
+        return index_key is None or labels.get('gonullu.index') == index_key
+
+    def build(self, base_image, warm_image, base_id, index_key):
+        self.log.information('%s imajından %s imajı hazırlanıyor.' % (base_image, warm_image))
+        build_directory = os.path.join('/', 'tmp', 'gonullu', 'build')
+        if not os.path.exists(build_directory):
+            os.makedirs(build_directory)
+
+        setup_script = os.path.join(build_directory, 'warm-setup.sh')
+        with open(setup_script, 'w') as f:
+            f.write('#!/bin/bash\nset -e\n')
+            f.write(SETUP_COMMANDS % (TOOLCHAIN, ''))
+        os.chmod(setup_script, 0o755)
+
+        binds = {
+            '/var/cache/pisi/packages': {'bind': '/var/cache/pisi/packages', 'mode': 'rw'},
+            '/var/cache/pisi/archives': {'bind': '/var/cache/pisi/archives', 'mode': 'rw'},
+            build_directory: {'bind': '/build', 'mode': 'rw'},
+        }
+        host_config = self.my_client.create_host_config(binds=binds, security_opt=['seccomp:unconfined'])
+        container = self.my_client.create_container(image=base_image, command='/build/warm-setup.sh',
+                                                    volumes=[b['bind'] for b in binds.values()],
+                                                    host_config=host_config)
+        try:
+            self.my_client.start(container['Id'])
+            result = self.my_client.wait(container['Id'])
+            status = result['StatusCode'] if isinstance(result, dict) else int(result)
+            if status != 0:
+                raise RuntimeError('%s imajı hazırlanamadı, çıkış kodu: %d' % (warm_image, status))
+
+            repository, tag = warm_image.split(':', 1)
+            self.my_client.commit(container['Id'], repository=repository, tag=tag,
+                                  changes=['LABEL gonullu.base=%s gonullu.index=%s' % (base_id, index_key)])
+            self.log.success('%s imajı hazırlandı.' % warm_image)
+        finally:
+            self.my_client.remove_container(container['Id'], force=True)
+            os.remove(setup_script)
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+from config import STATE_DIRECTORY
+from log import Log
+
+
+JOURNAL_DIRECTORY = os.path.join(STATE_DIRECTORY, 'journal')
+
+
+class Journal:
+    # çiftlikten alınan her işin durumunu diske yazan günlüğümüz. Program yeniden
+    # başlatıldığında (sinyal, çökme ya da açılış) yarım kalan işler buradan okunur;
+    # çalışan container'lara yeniden bağlanılır ve gönderilmemiş dosyalar gönderilir.
+    # Aşamalar: preparing -> building -> uploading -> uploaded -> reported, iş bitince kayıt silinir.
+    def __init__(self, directory=JOURNAL_DIRECTORY):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.log = Log()
+
+    def path(self, queue_id):
+        return os.path.join(self.directory, '%s.json' % queue_id)
+
+    def write(self, entry):
+        # kaydı önce geçici dosyaya yazıp rename ile değiştiriyoruz, yarım kayıt kalmasın.
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = '%s.tmp' % self.path(entry['queue_id'])
+            with open(tmp, 'w') as f:
+                json.dump(entry, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp, self.path(entry['queue_id']))
+        except OSError as e:
+            self.log.warning('%s paketinin iş kaydı yazılamadı: %s' % (entry['package'], str(e)))
+
+    def begin(self, response):
+        with self.lock:
+            entry = {'queue_id': response['queue_id'], 'package': response['package'], 'response': response,
+                     'stage': 'preparing', 'started': time.time(), 'container_id': None,
+                     'container_name': None, 'memory_limit': None, 'exit_code': None, 'oom_killed': False,
+                     'state': None, 'uploaded': {}}
+            self.entries[entry['queue_id']] = entry
+            self.write(entry)
+            return entry
+
+    def update(self, queue_id, **fields):
+        with self.lock:
+            entry = self.entries.get(queue_id)
+            if entry is None:
+                return
+            entry.update(fields)
+            self.write(entry)
+
+    def uploaded(self, file, sha1):
+        # gönderilen dosyayı, tekrar gönderilmemesi için boyutu ve özeti ile kaydeder.
+        package = os.path.basename(os.path.dirname(file))
+        with self.lock:
+            for entry in self.entries.values():
+                if entry['package'] == package:
+                    stat = os.stat(file)
+                    entry['uploaded'][file] = {'sha1': sha1, 'size': stat.st_size, 'mtime': stat.st_mtime}
+                    self.write(entry)
+                    return
+
+    def get(self, queue_id):
+        with self.lock:
+            entry = self.entries.get(queue_id)
+            return dict(entry) if entry else None
+
+    def sent_files(self, queue_id):
+        # kayıtlı gönderimlerden dosyası hâlâ aynı olanları döner.
+        with self.lock:
+            entry = self.entries.get(queue_id)
+            uploaded = dict(entry['uploaded']) if entry else {}
+        sent = set()
+        for file, record in uploaded.items():
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            if stat.st_size == record['size'] and stat.st_mtime == record['mtime']:
+                sent.add(file)
+        return sent
+
+    def finish(self, queue_id):
+        with self.lock:
+            self.entries.pop(queue_id, None)
+            try:
+                os.remove(self.path(queue_id))
+            except FileNotFoundError:
+                pass
+
+    def pending(self):
+        # önceki çalışmadan kalan işleri başlangıç zamanına göre sıralı döner.
+        if not os.path.isdir(self.directory):
+            return []
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name), 'r') as f:
+                        entry = json.load(f)
+                except (OSError, ValueError) as e:
+                    self.log.warning('%s iş kaydı okunamadı: %s' % (name, str(e)))
+                    continue
+                self.entries.setdefault(entry['queue_id'], entry)
+            return sorted((dict(entry) for entry in self.entries.values()), key=lambda entry: entry['started'])
+
+
+journal = Journal()
@@ -1,15 +1,46 @@
 from colorama import init, Fore, Style
+import atexit
+import json
+import queue
 import sys
 import os
 import datetime
+import threading
+import time
 
 
-class Log:
-    def __init__(self):
-        init(autoreset=True)
-        self.new_line = False
-        self.last_output_type = ''
-        
+class LogWriter(threading.Thread):
+    # süreç genelinde tek log dosyasına yazan arka plan thread'imiz. Mesajlar sınırlı
+    # bir kuyruğa atılır; dosya açık tutulur, JSON satırları olarak yazılır ve
+    # boyut sınırı aşılınca döndürülür (gonullu_x.log -> gonullu_x.log.1 ...).
+    instance = None
+    lock = threading.Lock()
+
+    def __init__(self, log_file, max_bytes=10 << 20, backup_count=5, queue_size=10000):
+        threading.Thread.__init__(self, name='gonullu-log', daemon=True)
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.records = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.file = None
+        # dosyanın boyutu; tell() metin dosyasında her çağrıda tamponu boşalttığı için kendimiz sayıyoruz.
+        self.size = 0
+
+    @classmethod
+    def get(cls):
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = LogWriter(cls.log_path())
+                cls.instance.start()
+                atexit.register(cls.instance.flush)
+                # İlk log mesajı
+                cls.instance.put({'time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'level': 'information',
+                                  'message': 'Gonullu Log Başlangıcı'})
+            return cls.instance
+
+    @staticmethod
+    def log_path():
         # Log dosyası için dizin oluştur (programın çalıştığı dizininde)
         current_dir = os.path.dirname(os.path.abspath(__file__))
         log_dir = os.path.join(current_dir, 'logs')
@@ -21,22 +52,93 @@ class Log:
                 log_dir = '/tmp/gonullu_logs'
                 if not os.path.exists(log_dir):
                     os.makedirs(log_dir, mode=0o755)
-        
+
         # Log dosyası adı (tarih ile)
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.log_file = os.path.join(log_dir, f'gonullu_{timestamp}.log')
-        
-        # İlk log mesajı
-        self._write_to_file(f"=== Gonullu Log Başlangıcı: {datetime.datetime.now()} ===")
+        return os.path.join(log_dir, f'gonullu_{timestamp}.log')
 
-    def _write_to_file(self, message):
-        """Mesajı dosyaya yazar"""
+    def put(self, record):
+        # kuyruk doluysa ana döngüyü bekletmek yerine mesajı atlıyoruz.
         try:
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(f'[{timestamp}] {message}\n')
-        except Exception:
-            pass  # Dosya yazma hatası olursa sessizce geç
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            # kuyrukta bekleyenleri de aynı turda alıp tek seferde flush ediyoruz.
+            batch = [self.records.get()]
+            while True:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for record in batch:
+                    self.write(record)
+                if self.file is not None:
+                    self.file.flush()
+            except Exception:
+                pass  # Dosya yazma hatası olursa sessizce geç
+            finally:
+                for _ in batch:
+                    self.records.task_done()
+
+    def write(self, record):
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            self.write({'time': record['time'], 'level': 'warning',
+                        'message': '%d log mesajı kuyruk dolu olduğu için yazılamadı' % dropped})
+        if self.file is None:
+            self.file = open(self.log_file, 'a', encoding='utf-8')
+            self.size = os.fstat(self.file.fileno()).st_size
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        self.file.write(line)
+        self.size += len(line.encode('utf-8'))
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = '%s.%d' % (self.log_file, index)
+            if os.path.exists(source):
+                os.rename(source, '%s.%d' % (self.log_file, index + 1))
+        os.rename(self.log_file, '%s.1' % self.log_file)
+
+    def flush(self):
+        # kuyruktaki tüm mesajlar yazılana kadar bekler.
+        self.records.join()
+
+
+class Log:
+    # aynı satırı güncelleyen (continued) ilerleme mesajları dosyaya en fazla bu aralıkla yazılır.
+    continued_interval = 60
+
+    def __init__(self):
+        init(autoreset=True)
+        self.new_line = False
+        self.last_output_type = ''
+        self.last_continued = {}
+
+        # tüm Log nesneleri aynı dosyayı ve aynı yazıcı thread'i kullanır.
+        self.writer = LogWriter.get()
+        self.log_file = self.writer.log_file
+
+    def _write_to_file(self, message, level='information', continued=False):
+        """Mesajı dosyaya yazılmak üzere kuyruğa atar"""
+        now = time.time()
+        if continued:
+            if now - self.last_continued.get(level, 0) < self.continued_interval:
+                return
+            self.last_continued[level] = now
+        self.writer.put({
+            'time': datetime.datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+            'level': level,
+            'thread': threading.current_thread().name,
+            'message': message,
+        })
 
     def error(self, message, continued=False):
         # burada hata mesajlarımızı yazdıracağız.
@@ -55,7 +157,7 @@ class Log:
             self.new_line = False
         
         # Dosyaya yaz
-        self._write_to_file(log_message)
+        self._write_to_file(message, 'error', continued)
 
     def information(self, message, continued=False):
         # burada bilgi mesajlarımızı yazdıracağız.
@@ -72,7 +174,7 @@ class Log:
             print(Fore.LIGHTBLUE_EX + '  ' + log_message + Style.RESET_ALL)
         
         # Dosyaya yaz
-        self._write_to_file(log_message)
+        self._write_to_file(message, 'information', continued)
 
     def success(self, message):
         # burada başarılı işlem mesajlarımızı yazdıracağız.
@@ -83,7 +185,7 @@ class Log:
         print(Fore.GREEN + '  ' + log_message + Style.RESET_ALL)
         
         # Dosyaya yaz
-        self._write_to_file(log_message)
+        self._write_to_file(message, 'success')
 
     def warning(self, message, continued=False):
         # burada uyarı mesajlarımız olacak.
@@ -100,7 +202,7 @@ class Log:
             print(Fore.YELLOW + '  ' + log_message + Style.RESET_ALL)
         
         # Dosyaya yaz
-        self._write_to_file(log_message)
+        self._write_to_file(message, 'warning', continued)
 
     @staticmethod
     def get_exit():
@@ -109,5 +211,3 @@ class Log:
     def blank_line(self):
         self.new_line = False
         print('')
-        # Dosyaya boş satır yazma
-        self._write_to_file('')
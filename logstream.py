@@ -0,0 +1,82 @@
+import html
+import os
+import tempfile
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+CHUNK_SIZE = 2 ** 20
+# sıkıştırılmış çıktı bu boyuta kadar bellekte, daha büyükse geçici dosyada tutulur.
+SPOOL_SIZE = 8 << 20
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+
+class ChunkReader:
+    # parça üreten bir iterator'ı dosya gibi okunabilir hale getirir.
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+        self.offset = 0
+
+    def read(self, size=-1):
+        # tampon sadece yeni parça eklenirken kopyalanır, okumalar offset ile ilerler.
+        while size is None or size < 0 or len(self.buffer) - self.offset < size:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                break
+            self.buffer = self.buffer[self.offset:] + chunk
+            self.offset = 0
+        end = len(self.buffer) if size is None or size < 0 else self.offset + size
+        data = self.buffer[self.offset:end]
+        self.offset = min(end, len(self.buffer))
+        return data
+
+    def close(self):
+        pass
+
+
+def html_chunks(filepath):
+    # log dosyasını parça parça okuyup html'e kaçışlanmış (escape) olarak <pre> içinde üretir.
+    yield b'<html><body><pre>'
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            text = f.read(CHUNK_SIZE)
+            if not text:
+                break
+            yield html.escape(text, quote=False).encode('utf-8')
+    yield b'</pre></body></html>'
+
+
+def compressed_chunks(chunks, compression):
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    elif compression == 'zstd':
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        raise ValueError('bilinmeyen sıkıştırma: %s' % compression)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def log_body(filepath, compression=None):
+    # gönderilecek dosya adını, okunabilir gövdeyi ve boyutunu döner; bellek kullanımı sabittir.
+    filename = '%s.html' % os.path.basename(filepath)
+    if compression:
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        for chunk in compressed_chunks(html_chunks(filepath), compression):
+            spool.write(chunk)
+        size = spool.tell()
+        spool.seek(0)
+        return filename + EXTENSIONS[compression], spool, size
+
+    # sıkıştırma yoksa boyutu önce yazmadan sayıp, gönderirken aynı içeriği yeniden üretiyoruz.
+    size = sum(len(chunk) for chunk in html_chunks(filepath))
+    return filename, ChunkReader(html_chunks(filepath)), size
@@ -0,0 +1,210 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import STATE_DIRECTORY
+from history import history
+from log import Log
+
+
+class Metrics:
+    # süreç genelindeki sayaç, gösterge ve özet (toplam/adet) değerlerimiz.
+    # render() Prometheus metin biçiminde (text/plain; version=0.0.4) çıktı üretir.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+        self.help = {}
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            key = self.key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            key = self.key(name, labels)
+            total, count = self.summaries.get(key, (0, 0))
+            self.summaries[key] = (total + value, count + 1)
+
+    @staticmethod
+    def format(name, labels, value):
+        if labels:
+            label_text = ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                                  for k, v in labels)
+            return '%s{%s} %s' % (name, label_text, value)
+        return '%s %s' % (name, value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted(set(key[0] for key in values)):
+                    lines.append('# TYPE %s %s' % (name, kind))
+                    for (key_name, labels), value in sorted(values.items()):
+                        if key_name == name:
+                            lines.append(self.format(name, labels, value))
+            for name in sorted(set(key[0] for key in self.summaries)):
+                lines.append('# TYPE %s summary' % name)
+                for (key_name, labels), (total, count) in sorted(self.summaries.items()):
+                    if key_name == name:
+                        lines.append(self.format('%s_sum' % name, labels, total))
+                        lines.append(self.format('%s_count' % name, labels, count))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class BuildMetrics:
+    # tek bir derlemenin aşama süreleri ve container kaynak kullanımı.
+    # derleme özetlerinin yazıldığı dizin.
+    directory = os.path.join(STATE_DIRECTORY, 'builds')
+
+    def __init__(self, response):
+        self.package = response['package']
+        self.queue_id = response['queue_id']
+        self.started = time.time()
+        self.stages = {}
+        self.peak_memory = 0
+        self.cpu_seconds = 0.0
+        self.io_bytes = 0
+        self.artifact_bytes = 0
+        self.exit_code = None
+        # .bitti dosyasındaki pisi çıkış kodu.
+        self.status = None
+        # başarısız derlemede hatanın türü (setup, dependency, fetch, compile).
+        self.failure = None
+        self.oom_killed = False
+        self.memory_limit = None
+        self.jobs = None
+        self.ccache = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.time() - started)
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        metrics.observe('gonullu_stage_seconds', seconds, stage=name)
+
+    def sample(self, stats):
+        # docker stats API'sinden gelen tek bir örneği işler.
+        if not stats:
+            return
+        memory = stats.get('memory_stats') or {}
+        self.peak_memory = max(self.peak_memory, memory.get('max_usage', 0), memory.get('usage', 0))
+        cpu = (stats.get('cpu_stats') or {}).get('cpu_usage') or {}
+        self.cpu_seconds = max(self.cpu_seconds, cpu.get('total_usage', 0) / 1e9)
+        io_bytes = 0
+        for entry in (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+            if entry.get('op', '').lower() in ('read', 'write'):
+                io_bytes += entry.get('value', 0)
+        self.io_bytes = max(self.io_bytes, io_bytes)
+        metrics.set('gonullu_container_memory_bytes', memory.get('usage', 0), package=self.package)
+
+    def sample_peak(self, peak):
+        # cgroup'tan okunan en yüksek bellek kullanımı; örnekler arasındaki tepeleri de kapsar.
+        self.peak_memory = max(self.peak_memory, peak)
+
+    def read_build_stages(self, path):
+        # derleme betiğinin yazdığı zaman damgalarından hazırlık ve derleme sürelerini hesaplar.
+        marks = {}
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2:
+                        marks[parts[0]] = float(parts[1])
+        except (OSError, ValueError):
+            return
+        if 'setup' in marks and 'compile' in marks:
+            self.add_stage('toolchain_setup', marks['compile'] - marks['setup'])
+        elif 'setup' in marks and 'setup_failed' in marks:
+            self.add_stage('toolchain_setup', marks['setup_failed'] - marks['setup'])
+        if 'compile' in marks and 'end' in marks:
+            self.add_stage('compile', marks['end'] - marks['compile'])
+
+    def summary(self):
+        return {
+            'package': self.package,
+            'queue_id': self.queue_id,
+            'started': self.started,
+            'duration': time.time() - self.started,
+            'exit_code': self.exit_code,
+            'status': self.status,
+            'failure': self.failure,
+            'oom_killed': self.oom_killed,
+            'memory_limit': self.memory_limit,
+            'jobs': self.jobs,
+            'stages': self.stages,
+            'peak_memory': self.peak_memory,
+            'cpu_seconds': self.cpu_seconds,
+            'io_bytes': self.io_bytes,
+            'artifact_bytes': self.artifact_bytes,
+            'ccache': {'hits': self.ccache[0], 'misses': self.ccache[1]} if self.ccache else None,
+        }
+
+    def finish(self):
+        # derleme bitince genel metrikleri günceller ve özet dosyasını yazar.
+        summary = self.summary()
+        status = 'success' if self.exit_code == 0 else 'failure'
+        metrics.inc('gonullu_builds_total', status=status)
+        metrics.observe('gonullu_build_seconds', summary['duration'])
+        metrics.observe('gonullu_build_cpu_seconds', self.cpu_seconds)
+        metrics.set('gonullu_build_peak_memory_bytes', self.peak_memory, package=self.package)
+        metrics.set('gonullu_container_memory_bytes', 0, package=self.package)
+        if self.failure:
+            metrics.inc('gonullu_build_failures_total', kind=self.failure)
+        if self.ccache:
+            metrics.inc('gonullu_ccache_hits_total', self.ccache[0])
+            metrics.inc('gonullu_ccache_misses_total', self.ccache[1])
+
+        history.add(summary)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, '%s-%s.json' % (self.queue_id, self.package)), 'w') as f:
+                json.dump(summary, f, indent=2)
+        except OSError as e:
+            Log().warning('%s paketinin derleme özeti yazılamadı: %s' % (self.package, str(e)))
+        return summary
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port, address='127.0.0.1'):
+    # /metrics uç noktasını arka planda sunar.
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='gonullu-metrics', daemon=True).start()
+    return server
@@ -0,0 +1,262 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import delta
+from log import Log
+
+
+class MockFarm:
+    # çiftliğin gönüllünün kullandığı uç noktalarını (requestPkg, upload, updaterunning ve
+    # isteğe bağlı delta/chunks, delta/assemble) yerelde taklit eden sunucumuz. Paketler arrival saniye arayla kuyruğa girer;
+    # her paketin kuyruğa girdiği, verildiği ve sonucunun bildirildiği an kaydedilir.
+    def __init__(self, packages=10, address='127.0.0.1', port=0, arrival=0.0, long_poll=True,
+                 image='pisilinux/gonullu:latest', distinct=0, affinity=True, delta=True):
+        # distinct verilirse paket isimleri bu sayıda farklı isim arasında tekrar eder.
+        # affinity açıksa istemcinin önbelleğinde olduğunu bildirdiği paketler önce verilir.
+        # delta kapalıysa fark gönderimi uç noktaları gerçek çiftlik gibi 404 döner.
+        self.log = Log()
+        self.lock = threading.Condition()
+        self.long_poll = long_poll
+        self.affinity = affinity
+        self.delta = delta
+        # gönderilen .pisi dosyalarının parçaları (özet -> içerik).
+        self.chunks = {}
+        self.image = image
+        self.closed = False
+        self.started = time.time()
+        self.jobs = []
+        for index in range(packages):
+            name = 'bench-%03d' % ((index % distinct if distinct else index) + 1)
+            self.jobs.append({'queue_id': index + 1, 'package': name,
+                              'released': self.started + index * arrival, 'issued': None, 'completed': None,
+                              'state': None, 'uploads': 0, 'upload_bytes': 0, 'warm': False})
+        self.server = ThreadingHTTPServer((address, port), MockFarmHandler)
+        self.server.daemon_threads = True
+        self.server.farm = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='gonullu-mockfarm', daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        # bekleyen long-poll isteklerini hemen yanıtlar ve sunucuyu kapatır.
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_job(self, wait, warm=()):
+        # yayınlanmış ve henüz verilmemiş ilk paketi (varsa istemcinin önbelleğinde olanı) verir,
+        # yoksa en fazla wait saniye bekler.
+        deadline = time.time() + (wait if self.long_poll else 0)
+        with self.lock:
+            while not self.closed:
+                now = time.time()
+                pending = [job for job in self.jobs if job['issued'] is None]
+                # gerçek çiftlik gibi aynı paketi aynı anda iki kez vermiyoruz.
+                building = set(job['package'] for job in self.jobs if job['issued'] and job['completed'] is None)
+                released = [job for job in pending if job['released'] <= now and job['package'] not in building]
+                if released:
+                    hits = [job for job in released if job['package'] in warm] if self.affinity else []
+                    job = hits[0] if hits else released[0]
+                    job['issued'] = now
+                    job['warm'] = job['package'] in warm
+                    return job
+                if now >= deadline:
+                    return None
+                # kuyruk boşalmış olsa da gerçek çiftlik gibi süre dolana kadar bekletiyoruz.
+                upcoming = [job['released'] for job in pending if job['released'] > now]
+                self.lock.wait(min([deadline] + upcoming) - now)
+        return None
+
+    def complete(self, queue_id, state):
+        with self.lock:
+            for job in self.jobs:
+                if job['queue_id'] == queue_id:
+                    job['completed'] = time.time()
+                    job['state'] = state
+            self.lock.notify_all()
+
+    def record_upload(self, filename, size):
+        with self.lock:
+            for job in self.jobs:
+                if job['package'] in filename:
+                    job['uploads'] += 1
+                    job['upload_bytes'] += size
+                    break
+
+    def store_chunks(self, content):
+        # tam gönderilen bir .pisi dosyasını istemci ile aynı şekilde bölüp saklar.
+        with self.lock:
+            for digest, start, end in delta.split(content):
+                self.chunks[digest] = content[start:end]
+
+    def add_chunks(self, header, body):
+        # X-Gonullu-Chunks başlığındaki sırayla gövdeyi parçalara ayırıp özetlerini doğrular.
+        offset = 0
+        chunks = {}
+        for item in header.split(','):
+            digest, _, length = item.partition(':')
+            data = body[offset:offset + int(length)]
+            offset += int(length)
+            if hashlib.sha1(data).hexdigest() != digest:
+                return False
+            chunks[digest] = data
+        if offset != len(body):
+            return False
+        with self.lock:
+            self.chunks.update(chunks)
+        return True
+
+    def assemble(self, request):
+        # parçalardan dosyayı birleştirir; (eksik parçalar, sha1 özeti) döner.
+        with self.lock:
+            missing = [digest for digest in request['chunks'] if digest not in self.chunks]
+            if missing:
+                return missing, None
+            content = b''.join(self.chunks[digest] for digest in request['chunks'])
+        self.record_upload(request['filename'], len(content))
+        return [], hashlib.sha1(content).hexdigest()
+
+    def finished(self):
+        with self.lock:
+            return all(job['completed'] is not None for job in self.jobs)
+
+    def wait_finished(self, timeout=None):
+        deadline = time.time() + timeout if timeout else None
+        with self.lock:
+            while not all(job['completed'] is not None for job in self.jobs):
+                remaining = deadline - time.time() if deadline else 1
+                if remaining <= 0:
+                    return False
+                self.lock.wait(min(remaining, 1))
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {'started': self.started, 'jobs': [dict(job) for job in self.jobs]}
+
+
+class MockFarmHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, body, content_type='application/json', headers=None, status=200):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        farm = self.server.farm
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+
+        if parts[0] == 'requestPkg':
+            warm = set(self.headers.get('X-Gonullu-Warm', '').split(','))
+            job = farm.next_job(float(query.get('wait', ['0'])[0]), warm)
+            if job is None:
+                response = {'state': 402}
+            else:
+                response = {'state': 200, 'queue_id': job['queue_id'], 'package': job['package'],
+                            'commit_id': 'benchmark', 'repo': 'main', 'branch': 'master',
+                            'dockerimage': farm.image, 'kernel_required': False,
+                            'binary_repo_dir': 'benchmark'}
+            self.reply(json.dumps(response), headers={'X-Long-Poll': '1' if farm.long_poll else '0'})
+        elif parts[0] == 'updaterunning':
+            farm.complete(int(query['id'][0]), int(query['state'][0]))
+            self.reply('ok', 'text/plain')
+        elif parts[0] == 'stats':
+            self.reply(json.dumps(farm.stats()))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        farm = self.server.farm
+        path = urlparse(self.path).path.strip('/')
+        if path.startswith('delta/') and farm.delta:
+            self.delta(path)
+            return
+        if path != 'upload':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        boundary = self.headers.get('Content-Type', '').split('boundary=')[-1].encode('utf-8')
+        body = self.rfile.read(length)
+
+        # dosya alanını bulup gerçek çiftlik gibi içeriğin sha1 özetini döneriz.
+        for part in body.split(b'--' + boundary):
+            head, _, content = part.partition(b'\r\n\r\n')
+            if b'filename="' not in head:
+                continue
+            filename = head.split(b'filename="')[1].split(b'"')[0].decode('utf-8')
+            content = content[:-2] if content.endswith(b'\r\n') else content
+            farm.record_upload(filename, len(content))
+            if farm.delta and filename.endswith('.pisi'):
+                farm.store_chunks(content)
+            self.reply(hashlib.sha1(content).hexdigest(), 'text/plain')
+            return
+        self.send_error(400)
+
+    def delta(self, path):
+        farm = self.server.farm
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if path == 'delta/chunks':
+            if farm.add_chunks(self.headers.get('X-Gonullu-Chunks', ''), body):
+                self.reply('ok', 'text/plain')
+            else:
+                self.send_error(400)
+        elif path == 'delta/assemble':
+            request = json.loads(body.decode('utf-8'))
+            missing, sha1 = farm.assemble(request)
+            if missing:
+                self.reply(json.dumps({'missing': missing}), status=409)
+            else:
+                # gerçek çiftlik gibi birleştirilen dosyanın sha1 özetini döneriz, istemci doğrular.
+                self.reply(sha1, 'text/plain')
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == '__main__':
+    # gerçek gönüllüyü (--farm http://127.0.0.1:<port>) yerel çiftliğe bağlamak için tek başına çalıştırılabilir.
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--packages', action='store', dest='packages', default=10, type=int)
+    parser.add_argument('--port', action='store', dest='port', default=8080, type=int)
+    parser.add_argument('--arrival', action='store', dest='arrival', default=0.0, type=float)
+    parser.add_argument('--image', action='store', dest='image', default='pisilinux/gonullu:latest', type=str)
+    parser.add_argument('--distinct', action='store', dest='distinct', default=0, type=int)
+    parser.add_argument('--no-affinity', action='store_true', dest='no_affinity', default=False)
+    parser.add_argument('--no-delta', action='store_true', dest='no_delta', default=False)
+    args = parser.parse_args()
+
+    farm = MockFarm(args.packages, port=args.port, arrival=args.arrival, image=args.image, distinct=args.distinct,
+                    affinity=not args.no_affinity, delta=not args.no_delta).start()
+    farm.log.information('Yerel çiftlik %s adresinde %d paket ile çalışıyor.' % (farm.url, args.packages))
+    try:
+        farm.wait_finished()
+        farm.log.success('Tüm paketler tamamlandı.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        farm.close()
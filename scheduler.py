@@ -0,0 +1,88 @@
+import argparse
+import threading
+import time
+import traceback
+
+from admission import MemoryAdmission
+from log import Log
+from topology import allocate
+from volunteer import Volunteer
+from worker import Worker
+
+
+class Slot(threading.Thread):
+    def __init__(self, index, worker, log):
+        threading.Thread.__init__(self, name='gonullu-slot-%d' % index, daemon=True)
+        self.index = index
+        self.worker = worker
+        self.log = log
+        self.fatal = False
+
+    def run(self):
+        # yuvamız kapanana kadar paket almaya devam eder.
+        while self.worker.running:
+            try:
+                self.worker.run()
+            except SystemExit:
+                # yetki hatası gibi durumlarda tüm programı durduruyoruz.
+                self.fatal = True
+                self.worker.stop()
+            except Exception:
+                self.log.error('%d. yuvada bilinmeyen bir hata oluştu: %s' % (self.index, traceback.format_exc()))
+                time.sleep(self.worker.farm.time)
+
+
+class Scheduler:
+    def __init__(self, args, farm, log=None):
+        # aynı makinede N adet bağımsız derleme yuvası çalıştıran zamanlayıcımız.
+        self.log = log if log else Log()
+        self.slot_count = max(1, int(args.slots))
+        self.slots = []
+        allocation = allocate(args.cpu_set, self.slot_count)
+        # bellek tüm yuvalar arasında sabit paylar yerine paketlerin geçmişine göre dağıtılır.
+        self.admission = MemoryAdmission(args.memory_limit, self.slot_count)
+        for index in range(self.slot_count):
+            # her yuva kendi bellek payı, cpu kümesi, docker ve farm durumu ile çalışır.
+            params = argparse.Namespace(**vars(args))
+            params.memory_limit = args.memory_limit / self.slot_count
+            volunteer = Volunteer(params)
+            volunteer.set_cpu_allocation(*allocation[index])
+            spare = None
+            if args.pipeline:
+                spare = Volunteer(params)
+                spare.set_cpu_allocation(*allocation[index])
+            worker = Worker(volunteer, farm.clone(), self.log, spare, self.admission)
+            self.slots.append(Slot(index, worker, self.log))
+
+    def resume(self, entries):
+        # yarım kalan işleri yuvalara sırayla dağıtır.
+        for index, entry in enumerate(entries):
+            self.slots[index % self.slot_count].worker.pending.append(entry)
+
+    def run(self):
+        self.log.information('%d derleme yuvası başlatılıyor.' % self.slot_count)
+        for slot in self.slots:
+            slot.start()
+
+        # sinyalleri yakalayabilmek için ana thread'i kısa aralıklarla bekletiyoruz.
+        while any(slot.is_alive() for slot in self.slots):
+            if any(slot.fatal for slot in self.slots):
+                break
+            time.sleep(1)
+
+        self.remove()
+        self.log.get_exit()
+
+    def stop(self):
+        for slot in self.slots:
+            slot.worker.stop()
+
+    def detach(self):
+        # container'lara dokunmadan yuvaları durdurur, işler bir sonraki açılışta sürdürülür.
+        self.stop()
+
+    def remove(self):
+        # çalışan tüm yuvaların container'larını durdurup siler.
+        self.stop()
+        for slot in self.slots:
+            slot.worker.remove()
@@ -0,0 +1,74 @@
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log import LogWriter  # noqa: E402
+
+
+# testlerin logları proje dizinine değil geçici dizine yazılır. Modül düzeyindeki
+# journal, history ve delta.records testler toplanırken Log() çağırdığı için
+# yönlendirme fixture ile değil conftest yüklenirken yapılır.
+LOG_DIRECTORY = tempfile.mkdtemp(prefix='gonullu-tests-')
+LOG_PATH = os.path.join(LOG_DIRECTORY, 'gonullu.log')
+LogWriter.log_path = staticmethod(lambda: LOG_PATH)
+atexit.register(shutil.rmtree, LOG_DIRECTORY, True)
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    # sahte docker ve yerel çiftlikle tek paketlik bir gönüllü; tüm durum dosyaları geçici dizinde.
+    import cache
+    import config
+    import delta
+    from farm import Farm
+    from fakedocker import FakeDockerClient
+    from Gdocker import Docker
+    from history import history
+    from journal import journal
+    from metrics import BuildMetrics
+    from mockfarm import MockFarm
+
+    FakeDockerClient.reset()
+    monkeypatch.setattr(Docker, 'client_factory', FakeDockerClient)
+    for key, value in {'build_time': 0.2, 'jitter': 0.0, 'artifacts': 1, 'artifact_size': 64 << 10,
+                       'artifact_change': 1.0, 'log_size': 4 << 10, 'failure_rate': 0.0,
+                       'failure_kind': 'compile', 'download_time': 0.0}.items():
+        monkeypatch.setattr(FakeDockerClient, key, value)
+    monkeypatch.setattr(journal, 'directory', str(tmp_path / 'journal'))
+    monkeypatch.setattr(journal, 'entries', {})
+    for name in ('SHARED_ROOT', 'WORK_ROOT', 'CCACHE_ROOT'):
+        monkeypatch.setattr(cache, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(cache, 'INDEX_FILE', str(tmp_path / 'pisi-cache.json'))
+    monkeypatch.setattr(cache, 'LOCK_FILE', str(tmp_path / 'pisi-cache.lock'))
+    monkeypatch.setattr(cache.PackageCache, 'warm', None)
+    monkeypatch.setattr(history, 'path', str(tmp_path / 'history.sqlite'))
+    monkeypatch.setattr(history, 'connection', None)
+    monkeypatch.setattr(delta.records, 'directory', str(tmp_path / 'delta'))
+    monkeypatch.setattr(BuildMetrics, 'directory', str(tmp_path / 'builds'))
+    for name, value in (('path', str(tmp_path / 'mail_config.yml')), ('checked', 0), ('mtime', None),
+                        ('value', config.MAIL_CONFIG.default)):
+        monkeypatch.setattr(config.MAIL_CONFIG, name, value)
+
+    mock = MockFarm(1).start()
+    farm = Farm(mock.url, 'test@localhost', upload_retries=1)
+    farm.time = 1
+    args = argparse.Namespace(memory_limit=50, cpu_set=100, image_ttl=3600, job=2, warm=False, cache_size=1024,
+                              ccache=None, ccache_total=0, workspace='dir', scratch=str(tmp_path / 'scratch'),
+                              tmpfs_size=4096)
+    output = '/tmp/gonullu/%s' % mock.jobs[0]['package']
+    shutil.rmtree(output, True)
+    try:
+        yield argparse.Namespace(mock=mock, farm=farm, args=args, output=output, client=FakeDockerClient,
+                                 journal=journal)
+    finally:
+        mock.close()
+        shutil.rmtree(output, True)
+        if history.connection is not None:
+            history.connection.close()
@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+import cache
+from cache import CompilerCache, PackageCache
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'SHARED_ROOT', str(tmp_path / 'pisi'))
+    monkeypatch.setattr(cache, 'WORK_ROOT', str(tmp_path / 'work'))
+    monkeypatch.setattr(cache, 'INDEX_FILE', str(tmp_path / 'pisi-cache.json'))
+    monkeypatch.setattr(cache, 'LOCK_FILE', str(tmp_path / 'pisi-cache.lock'))
+    monkeypatch.setattr(PackageCache, 'warm', None)
+    archives = tmp_path / 'pisi' / 'archives'
+    archives.mkdir(parents=True)
+    for index in range(10):
+        (archives / ('arsiv-%d.tar.xz' % index)).write_bytes(os.urandom(1 << 20))
+    return tmp_path
+
+
+def archives(roots):
+    return sorted(os.listdir(str(roots / 'pisi' / 'archives')))
+
+
+def test_evict_skips_files_linked_from_running_build(roots):
+    store = PackageCache(size_limit=8)
+    store.checkout('calisan')
+    store.checkout('biten')
+    (roots / 'work' / 'biten' / 'archives' / 'yeni.tar.xz').write_bytes(os.urandom(1 << 20))
+    store.checkin('biten')
+
+    # çalışan derlemenin bağlı olduğu dosyalar silinmez, silinseler de yer açılmazdı.
+    assert ['arsiv-%d.tar.xz' % index for index in range(10)] == [name for name in archives(roots)
+                                                                  if name.startswith('arsiv-')]
+
+
+def test_evict_frees_least_recently_used_after_checkin(roots):
+    store = PackageCache(size_limit=8)
+    store.checkout('calisan')
+    store.checkin('calisan')
+
+    remaining = archives(roots)
+    assert len(remaining) == 7
+    total = sum(os.path.getsize(str(roots / 'pisi' / 'archives' / name)) for name in remaining)
+    assert total <= store.size_limit * 0.9
+    assert sorted(PackageCache.load_index()['files']) == ['archives/%s' % name for name in remaining]
+
+
+def test_ccache_evict_keeps_directories_of_running_builds(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CCACHE_ROOT', str(tmp_path / 'ccache'))
+    monkeypatch.setattr(CompilerCache, 'checkouts', {})
+    store = CompilerCache(total_limit=2)
+    # uzun süren derleme en eski dizin olur, diğer yuvalar kısa derlemelerini bitirir.
+    for index, package in enumerate(('uzun', 'kisa-1', 'kisa-2')):
+        directory = store.checkout(package)
+        with open(os.path.join(directory, 'nesne.o'), 'wb') as f:
+            f.write(os.urandom(1 << 20))
+        os.utime(directory, (time.time() - 100 + index, time.time() - 100 + index))
+    store.checkin('kisa-1')
+    store.checkin('kisa-2')
+    os.utime(store.directory('kisa-1'), (time.time() - 50, time.time() - 50))
+
+    store.evict()
+    assert sorted(os.listdir(str(tmp_path / 'ccache'))) == ['kisa-2', 'uzun']
+
+    # biten uzun derlemenin dizini checkin ile en yeni kullanılan olur.
+    store.checkin('uzun')
+    with open(os.path.join(store.checkout('yeni'), 'nesne.o'), 'wb') as f:
+        f.write(os.urandom(1 << 20))
+    store.checkin('yeni')
+    store.evict()
+    assert sorted(os.listdir(str(tmp_path / 'ccache'))) == ['uzun', 'yeni']
@@ -0,0 +1,28 @@
+import threading
+import time
+
+import config
+from config import ConfigFile, package_set
+
+
+def test_concurrent_first_load_never_returns_default(tmp_path, monkeypatch):
+    path = tmp_path / 'sandbox-requirement.yml'
+    path.write_text('- firefox\n- thunderbird\n')
+    exempt = ConfigFile('sandbox-requirement.yml', package_set, frozenset())
+    exempt.path = str(path)
+
+    # ilk okuma yavaşken diğer thread'ler kilitsiz yoldan varsayılanı almamalı.
+    safe_load = config.yaml.safe_load
+
+    def slow_load(stream):
+        time.sleep(0.2)
+        return safe_load(stream)
+
+    monkeypatch.setattr(config.yaml, 'safe_load', slow_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append('firefox' in exempt.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 4
@@ -0,0 +1,40 @@
+import threading
+
+from coordinator import Coordinator, Node, Waiter
+
+
+class RefusingFarm:
+    # mail adresi reddedilen çiftlik: get_package log.get_exit() ile SystemExit fırlatır.
+    def get_package(self):
+        raise SystemExit(1)
+
+
+def test_refused_request_stops_coordinator():
+    coordinator = Coordinator(RefusingFarm(), port=0).start()
+    waiter = {}
+    thread = threading.Thread(target=lambda: waiter.update(result=coordinator.request(Node('host'), 30)))
+    thread.start()
+    assert coordinator.stopped.wait(5)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert waiter['result'].job is None
+
+
+def test_requeue_puts_job_back_first():
+    coordinator = Coordinator(None, port=0)
+    try:
+        node = Node('host')
+        first = {'queue_id': 1, 'package': 'a', 'dockerimage': 'image'}
+        second = {'queue_id': 2, 'package': 'b', 'dockerimage': 'image'}
+        coordinator.jobs = [first, second]
+        waiter = Waiter(node)
+        coordinator.waiters.append(waiter)
+        coordinator.dispatch()
+        assert waiter.job is first and node.assigned == 1 and '1' in coordinator.assignments
+
+        coordinator.requeue(waiter)
+        assert coordinator.jobs == [first, second]
+        assert node.assigned == 0
+        assert '1' not in coordinator.assignments
+    finally:
+        coordinator.server.server_close()
@@ -0,0 +1,99 @@
+import hashlib
+import random
+
+import pytest
+
+import delta
+from farm import Farm
+from journal import journal
+from mockfarm import MockFarm
+
+
+NAME = '1-benchmark-bench-001-1.0-1-p2-x86_64.pisi'
+
+
+def payload(size, seed=1):
+    return random.Random(seed).getrandbits(size * 8).to_bytes(size, 'little')
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.setattr(delta.records, 'directory', str(tmp_path / 'delta'))
+    monkeypatch.setattr(journal, 'directory', str(tmp_path / 'journal'))
+    return tmp_path
+
+
+def write(path, data):
+    with open(str(path), 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def upload(url, path):
+    farm = Farm(url, 'test@localhost', upload_retries=1, delta_uploads=True)
+    sent = []
+    send_chunks = farm.send_chunks
+    farm.send_chunks = lambda *args: sent.append(send_chunks(*args)) or sent[-1]
+    return farm, farm.send(path, 'test'), sent
+
+
+def test_chunk_file_matches_split(tmp_path, monkeypatch):
+    # dosyayı parça parça okuyan chunk_file, çiftliğin bellekte böldüğü sınırları bulmalı.
+    monkeypatch.setattr(delta, 'READ_SIZE', 100 << 10)
+    data = payload(3 << 20)
+    manifest = delta.chunk_file(write(tmp_path / NAME, data))
+    assert manifest['sha1'] == hashlib.sha1(data).hexdigest()
+    assert manifest['size'] == len(data)
+    assert manifest['chunks'] == [[digest, end - start] for digest, start, end in delta.split(data)]
+    assert all(length <= delta.MAX_CHUNK for _, length in manifest['chunks'])
+
+
+def test_delta_round_trip(state):
+    mock = MockFarm(1).start()
+    try:
+        data = payload(2 << 20)
+        path = write(state / NAME, data)
+        _, ok, sent = upload(mock.url, path)
+        assert ok and not sent
+
+        # ortaya eklenen bölüm sadece çevresindeki parçaları değiştirir.
+        changed = data[:1 << 20] + payload(1000, seed=2) + data[1 << 20:]
+        write(path, changed)
+        _, ok, sent = upload(mock.url, path)
+        assert ok
+        assert 0 < sum(sent) < len(changed) // 4
+    finally:
+        mock.close()
+
+
+def test_delta_resends_missing_chunks(state):
+    mock = MockFarm(1).start()
+    try:
+        data = payload(1 << 20)
+        path = write(state / NAME, data)
+        assert upload(mock.url, path)[1]
+
+        # çiftlik önceki parçaları silmiş: 409 ile eksik parçaları isteyince hepsi gönderilir.
+        mock.chunks.clear()
+        write(path, data + b'tail')
+        _, ok, sent = upload(mock.url, path)
+        assert ok
+        assert sum(sent) == len(data) + 4
+    finally:
+        mock.close()
+
+
+def test_delta_unsupported_falls_back_to_full_upload(state):
+    mock = MockFarm(1, delta=False).start()
+    try:
+        data = payload(1 << 20)
+        path = write(state / NAME, data)
+        assert upload(mock.url, path)[1]
+
+        write(path, data + b'tail')
+        farm, ok, _ = upload(mock.url, path)
+        assert ok
+        assert not farm.delta_supported
+        assert mock.stats()['jobs'][0]['upload_bytes'] == 2 * len(data) + 4
+    finally:
+        mock.close()
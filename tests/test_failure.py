@@ -0,0 +1,67 @@
+import os
+
+import failure
+from failure import FailureDetector
+
+
+def write(directory, name, text, mode='w'):
+    with open(os.path.join(str(directory), name), mode) as f:
+        f.write(text)
+
+
+def test_scan_reads_only_new_lines_and_joins_split_lines(tmp_path):
+    detector = FailureDetector(str(tmp_path))
+    write(tmp_path, 'paket.err', 'configure: checking for gcc\nError: Unsatisfied build ')
+    assert detector.scan() is None
+    # satırın devamı sonraki taramada gelir, iki parça birlikte eşleşmeli.
+    write(tmp_path, 'paket.err', 'dependencies: libfoo-devel\n', 'a')
+    assert detector.scan() == failure.DEPENDENCY
+    assert detector.line == 'Error: Unsatisfied build dependencies: libfoo-devel'
+    assert detector.offsets[str(tmp_path / 'paket.err')] == os.path.getsize(str(tmp_path / 'paket.err'))
+
+
+def test_scan_detects_setup_failure_from_stages(tmp_path):
+    write(tmp_path, '.stages', 'setup 1.0\nsetup_failed 2.0\n')
+    write(tmp_path, 'paket.err', 'Error: Could not update repository index\n')
+    detector = FailureDetector(str(tmp_path))
+    assert detector.scan() == failure.SETUP
+    assert detector.line == 'Error: Could not update repository index'
+
+
+def test_classify(tmp_path):
+    detector = FailureDetector(str(tmp_path))
+    assert detector.classify(0) is None
+
+    # son satır yeni satır ile bitmese de sonuçta değerlendirilir.
+    write(tmp_path, 'paket.err', 'Error: could not fetch https://example.org/paket.tar.xz')
+    assert detector.classify(1) == failure.FETCH
+
+
+def test_classify_reads_log_tail_and_falls_back_to_compile(tmp_path):
+    write(tmp_path, 'paket.err', 'make: *** [all] Error 2\n')
+    write(tmp_path, 'paket.log', 'x' * failure.TAIL_SIZE + '\nsha1sum of paket.tar.xz mismatch\n')
+    assert FailureDetector(str(tmp_path)).classify(1) == failure.FETCH
+
+    os.remove(str(tmp_path / 'paket.log'))
+    detector = FailureDetector(str(tmp_path))
+    assert detector.classify(1) == failure.COMPILE
+    assert detector.line == 'derleme hatası'
+
+
+def test_stopped(tmp_path):
+    assert FailureDetector(str(tmp_path)).stopped(137, True) == failure.OOM
+    detector = FailureDetector(str(tmp_path))
+    assert detector.stopped(-1, False) == failure.KILLED
+    assert '-1' in detector.line
+
+
+def test_relevant_files(tmp_path):
+    write(tmp_path, 'paket.log', 'derleme\n')
+    write(tmp_path, 'paket.err', 'hata\n')
+    detector = FailureDetector(str(tmp_path))
+    log, err = str(tmp_path / 'paket.log'), str(tmp_path / 'paket.err')
+    assert detector.relevant_files(failure.DEPENDENCY) == [err]
+    assert detector.relevant_files(failure.COMPILE) == [log, err]
+    assert detector.relevant_files(failure.OOM) == [log, err]
+    os.remove(err)
+    assert detector.relevant_files(failure.SETUP) == [log]
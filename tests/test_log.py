@@ -0,0 +1,30 @@
+import os
+
+from log import LogWriter
+
+
+def record(message):
+    return {'time': '2026-01-01 00:00:00', 'level': 'information', 'message': message}
+
+
+def test_write_does_not_flush_each_record(tmp_path):
+    writer = LogWriter(str(tmp_path / 'gonullu.log'))
+    for index in range(5):
+        writer.write(record('satır %d' % index))
+    # kayıtlar tamponda bekler, dosyaya grup sonunda tek seferde yazılır.
+    assert os.path.getsize(writer.log_file) == 0
+    writer.file.flush()
+    assert os.path.getsize(writer.log_file) == writer.size
+    writer.file.close()
+
+
+def test_rotates_on_counted_size(tmp_path):
+    path = tmp_path / 'gonullu.log'
+    path.write_text('önceki çalışma\n', encoding='utf-8')
+    writer = LogWriter(str(path), max_bytes=300, backup_count=2)
+    for index in range(7):
+        writer.write(record('çok baytlı ğüşiöç satır %d' % index))
+    writer.file.flush()
+    assert os.path.getsize('%s.1' % path) >= 300
+    assert os.path.getsize(str(path)) == writer.size < 300
+    writer.file.close()
@@ -0,0 +1,48 @@
+import gzip
+
+import pytest
+
+import logstream
+from logstream import log_body
+
+
+TEXT = 'derleme <hata> & "uyarı" ğüşiöç\n' * 50
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    # küçük parçalarla okununca çok baytlı karakterler parça sınırlarına denk gelir.
+    monkeypatch.setattr(logstream, 'CHUNK_SIZE', 7)
+    path = tmp_path / 'paket.log'
+    path.write_text(TEXT, encoding='utf-8')
+    return str(path)
+
+
+def read_all(body, size=5):
+    data = b''
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def expected():
+    escaped = TEXT.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return ('<html><body><pre>%s</pre></body></html>' % escaped).encode('utf-8')
+
+
+def test_html_body_is_escaped_and_size_matches(log_file):
+    filename, body, size = log_body(log_file)
+    data = read_all(body)
+    assert filename == 'paket.log.html'
+    assert data == expected()
+    assert size == len(data)
+
+
+def test_gzip_body(log_file):
+    filename, body, size = log_body(log_file, 'gzip')
+    data = body.read()
+    assert filename == 'paket.log.html.gz'
+    assert size == len(data)
+    assert gzip.decompress(data) == expected()
@@ -0,0 +1,26 @@
+import pytest
+
+import topology
+
+
+@pytest.fixture
+def smt_cores(monkeypatch):
+    # 4 fiziksel çekirdek, her biri 2 SMT kardeşiyle: (0, 4), (1, 5), (2, 6), (3, 7).
+    cores = [[core, core + 4] for core in range(4)]
+    monkeypatch.setattr(topology, 'physical_cores', lambda: (cores, {}))
+    return cores
+
+
+def test_slots_keep_smt_siblings_together(smt_cores):
+    allocation = topology.allocate(100, 3)
+    assert [cpus for cpus, _, _ in allocation] == [[0, 4, 1, 5], [2, 6], [3, 7]]
+    for cpus, _, share in allocation:
+        assert share == len(cpus)
+        for core in smt_cores:
+            assert set(core) <= set(cpus) or not set(core) & set(cpus)
+
+
+def test_more_slots_than_cores_share_cpus(smt_cores):
+    allocation = topology.allocate(50, 3)
+    assert all(cpus == [0, 4, 1, 5] for cpus, _, _ in allocation)
+    assert allocation[0][2] == pytest.approx(4 / 3.0)
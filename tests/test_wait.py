@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import pytest
+import requests
+
+import Gdocker
+from fakedocker import FakeDockerClient
+from Gdocker import Docker
+
+
+class BrokenClient(FakeDockerClient):
+    # docker servisine erişilemiyormuş gibi davranan istemci.
+    def wait(self, container, timeout=None, **kwargs):
+        raise requests.exceptions.ConnectionError('Connection refused')
+
+
+@pytest.fixture
+def docker(monkeypatch):
+    FakeDockerClient.reset()
+    monkeypatch.setattr(Docker, 'client_factory', FakeDockerClient)
+    container = Docker(argparse.Namespace(memory_limit=50, cpu_set=100, image_ttl=3600))
+    container.get_client()
+    container.container_id = container.my_client.create_container(image='test', command='sleep', name='test')['Id']
+    container.name = 'test'
+    return container
+
+
+def test_wait_returns_exit_code_when_container_finishes(docker):
+    docker.my_client.start(docker.container_id)
+    assert docker.wait_container(timeout=5) == 0
+
+
+def test_wait_times_out_while_container_runs(docker):
+    container = docker.my_client.find(docker.container_id)
+    container.running = True
+    started = time.time()
+    assert docker.wait_container(timeout=0.2) is None
+    assert time.time() - started >= 0.2
+    assert docker.wait_errors == 0
+
+
+def test_wait_treats_removed_container_as_stopped(docker):
+    docker.my_client.remove_container(docker.container_id, force=True)
+    assert docker.wait_container(timeout=5) == -1
+
+
+def test_wait_backs_off_on_daemon_errors(docker, monkeypatch):
+    delays = []
+    monkeypatch.setattr(Gdocker.time, 'sleep', delays.append)
+    docker.my_client = BrokenClient()
+    for _ in range(3):
+        assert docker.wait_container(timeout=10) is None
+    assert delays == [2, 4, 8]
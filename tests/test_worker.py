@@ -0,0 +1,170 @@
+import glob
+import json
+import os
+
+from admission import MemoryAdmission
+from metrics import BuildMetrics
+from volunteer import Volunteer
+from worker import Worker
+
+
+def job_state(world):
+    return world.mock.stats()['jobs'][0]
+
+
+def test_container_killed_without_result_is_reported(world):
+    # bellek sınırı aşılınca container .bitti yazamadan ölür; başarı sayılmamalı.
+    world.client.failure_rate = 1.0
+    world.client.failure_kind = 'oom'
+    worker = Worker(Volunteer(world.args), world.farm)
+    worker.process(world.farm.get_package())
+
+    job = job_state(world)
+    assert job['state'] == 137
+    assert job['uploads'] == 2
+    assert not os.path.exists('%s/%s.bitti' % (world.output, job['package']))
+    assert world.journal.pending() == []
+    with open(glob.glob(os.path.join(BuildMetrics.directory, '*.json'))[0]) as f:
+        assert json.load(f)['failure'] == 'oom'
+
+
+def start_build(world):
+    # önceki çalışmada başlatılmış, sonra program yeniden başladığı için yarım kalmış derleme.
+    response = world.farm.get_package()
+    volunteer = Volunteer(world.args)
+    world.journal.begin(response)
+    volunteer.get_package_farm(response)
+    world.journal.update(response['queue_id'], stage='building', container_id=volunteer.container_id,
+                         container_name=volunteer.name, memory_limit=volunteer.memory_limit)
+    return world.journal.pending()[0]
+
+
+class RecordingAdmission(MemoryAdmission):
+    def release(self, key):
+        self.released = dict(self.reserved)
+        MemoryAdmission.release(self, key)
+
+
+def test_reattached_build_reserves_memory(world):
+    entry = start_build(world)
+    admission = RecordingAdmission(50)
+    worker = Worker(Volunteer(world.args), world.farm, admission=admission)
+    worker.resume(entry)
+
+    assert admission.released == {worker.volunteer: entry['memory_limit']}
+    assert admission.reserved == {}
+    assert job_state(world)['state'] == 0
+
+
+def test_tmpfs_workspace_is_counted_in_memory_limit(world):
+    world.args.workspace = 'tmpfs'
+    world.args.tmpfs_size = 2048
+    admission = RecordingAdmission(50)
+    volunteer = Volunteer(world.args)
+    tmpfs = []
+    volunteer.add_tmpfs = lambda path, options: tmpfs.append((path, options))
+    Worker(volunteer, world.farm, admission=admission).process(world.farm.get_package())
+
+    assert tmpfs == [('/var/pisi', 'exec,size=2048m')]
+    assert admission.released == {volunteer: admission.default + 2048}
+    assert job_state(world)['state'] == 0
+
+
+def stages(world, monkeypatch):
+    # iş kaydının geçtiği aşamalar, sırasıyla.
+    seen = []
+    update = world.journal.update
+
+    def record(queue_id, **fields):
+        if 'stage' in fields:
+            seen.append(fields['stage'])
+        return update(queue_id, **fields)
+
+    monkeypatch.setattr(world.journal, 'update', record)
+    return seen
+
+
+def finish_container(world, entry):
+    world.client().wait(entry['container_name'], timeout=10)
+
+
+def test_successful_build_stages(world, monkeypatch):
+    seen = stages(world, monkeypatch)
+    Worker(Volunteer(world.args), world.farm).process(world.farm.get_package())
+    assert seen == ['building', 'uploading', 'uploaded', 'reported']
+    assert job_state(world)['state'] == 0
+    assert world.journal.pending() == []
+
+
+def test_failed_build_stages(world, monkeypatch):
+    # sonuç loglar gönderilmeden bildirilir, kayıt loglar gidene kadar uploading'de kalır.
+    world.client.failure_rate = 1.0
+    seen = stages(world, monkeypatch)
+    Worker(Volunteer(world.args), world.farm).process(world.farm.get_package())
+    assert seen == ['building', 'uploading', 'reported']
+    assert job_state(world)['state'] == 1
+    assert world.journal.pending() == []
+
+
+def test_resume_reattaches_running_build(world):
+    entry = start_build(world)
+    Worker(Volunteer(world.args), world.farm).resume(entry)
+    job = job_state(world)
+    assert job['state'] == 0
+    assert job['uploads'] == 3
+    assert world.journal.pending() == []
+
+
+def test_resume_sends_remaining_outputs(world):
+    entry = start_build(world)
+    finish_container(world, entry)
+    world.client().remove_container(entry['container_name'], force=True)
+    # .pisi dosyası yeniden başlatmadan önce gönderilmiş, sadece loglar kalmış.
+    pisi = glob.glob('%s/*.pisi' % world.output)[0]
+    world.journal.update(entry['queue_id'], stage='uploading')
+    world.journal.uploaded(pisi, 'sha1')
+
+    Worker(Volunteer(world.args), world.farm).resume(world.journal.pending()[0])
+    job = job_state(world)
+    assert job['state'] == 0
+    assert job['uploads'] == 2
+    assert world.journal.pending() == []
+    assert not os.path.exists(world.output)
+
+
+def test_resume_reports_stopped_container_without_result(world):
+    entry = start_build(world)
+    finish_container(world, entry)
+    world.client().remove_container(entry['container_name'], force=True)
+    os.remove('%s/%s.bitti' % (world.output, entry['package']))
+    world.journal.update(entry['queue_id'], stage='uploading', exit_code=137, oom_killed=True)
+
+    Worker(Volunteer(world.args), world.farm).resume(world.journal.pending()[0])
+    assert job_state(world)['state'] == 137
+    assert world.journal.pending() == []
+
+
+def test_resume_only_reports_uploaded_build(world):
+    entry = start_build(world)
+    finish_container(world, entry)
+    world.journal.update(entry['queue_id'], stage='uploaded', state=0)
+
+    Worker(Volunteer(world.args), world.farm).resume(world.journal.pending()[0])
+    job = job_state(world)
+    assert job['state'] == 0
+    assert job['uploads'] == 0
+    assert world.journal.pending() == []
+    assert world.client.containers_by_id == {}
+
+
+def test_resume_rebuilds_lost_build(world):
+    response = world.farm.get_package()
+    world.journal.begin(response)
+    world.journal.update(response['queue_id'], stage='building', container_id='kayip', container_name='kayip',
+                         memory_limit=1024)
+
+    Worker(Volunteer(world.args), world.farm).resume(world.journal.pending()[0])
+    job = job_state(world)
+    assert job['state'] == 0
+    assert job['uploads'] == 3
+    assert world.journal.pending() == []
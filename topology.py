@@ -0,0 +1,111 @@
+import glob
+import os
+
+
+# derleme başına -j hesaplarken iş başına ayırdığımız bellek (MB).
+MEMORY_PER_JOB = 1024
+
+
+def parse_cpulist(text):
+    # '0-3,8,10-11' biçimindeki listeyi işlemci numaralarına çevirir.
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus):
+    # işlemci numaralarını docker'ın beklediği '0-3,8' biçimine çevirir.
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(a) if a == b else '%d-%d' % (a, b) for a, b in ranges)
+
+
+def read_file(path, default=None):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def cpu_nodes():
+    # her işlemcinin bağlı olduğu NUMA düğümü.
+    nodes = {}
+    for path in glob.glob('/sys/devices/system/node/node[0-9]*'):
+        node = int(os.path.basename(path)[4:])
+        for cpu in parse_cpulist(read_file(os.path.join(path, 'cpulist'), '')):
+            nodes[cpu] = node
+    return nodes
+
+
+def physical_cores():
+    # kullanabildiğimiz işlemcileri (NUMA düğümü, soket, çekirdek) sırasıyla fiziksel
+    # çekirdeklere gruplar; SMT kardeşleri aynı grupta olur.
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count()))
+    nodes = cpu_nodes()
+    cores = {}
+    for cpu in cpus:
+        base = '/sys/devices/system/cpu/cpu%d/topology' % cpu
+        package = int(read_file(os.path.join(base, 'physical_package_id'), 0))
+        core = int(read_file(os.path.join(base, 'core_id'), cpu))
+        cores.setdefault((nodes.get(cpu, 0), package, core), []).append(cpu)
+    return [cores[key] for key in sorted(cores)], nodes
+
+
+def allocate(percent, slots=1):
+    # işlemcilerin yüzde percent'ini slots adet yuvaya paylaştırır. Her yuva için
+    # (işlemci listesi, bellek düğümleri, işlemci payı) döner. Fiziksel çekirdekler
+    # bölünmez ve yuvalar mümkün olduğunca tek bir NUMA düğümünde kalır.
+    cores, nodes = physical_cores()
+    total = sum(len(core) for core in cores)
+    wanted = max(1, min(total, int(round(total * percent / 100.0))))
+
+    # istenen işlemci sayısına ulaşana kadar fiziksel çekirdekleri sırayla alıyoruz, yüzde
+    # bir çekirdeğin ortasına denk gelirse sadece son çekirdeğin bir kısmı alınır.
+    selected = []
+    count = 0
+    for core in cores:
+        if count >= wanted:
+            break
+        selected.append(core[:wanted - count])
+        count += len(selected[-1])
+
+    if slots > len(selected):
+        # yuva sayısı fiziksel çekirdekten fazlaysa hepsi aynı kümeyi paylaşır, kotayla bölünür.
+        cpus = [cpu for core in selected for cpu in core]
+        share = float(len(cpus)) / slots
+        mems = sorted(set(nodes.get(cpu, 0) for cpu in cpus))
+        return [(cpus, mems, share)] * slots
+
+    # yuvalar işlemci sayısına göre değil bütün çekirdeklere göre bölünür; böylece SMT
+    # kardeşleri hiçbir zaman iki ayrı yuvaya düşmez.
+    allocation = []
+    size, extra = divmod(len(selected), slots)
+    start = 0
+    for index in range(slots):
+        end = start + size + (1 if index < extra else 0)
+        cpus = [cpu for core in selected[start:end] for cpu in core]
+        mems = sorted(set(nodes.get(cpu, 0) for cpu in cpus))
+        allocation.append((cpus, mems, float(len(cpus))))
+        start = end
+    return allocation
+
+
+def jobs_for(cpus, memory_mb, memory_per_job=MEMORY_PER_JOB):
+    # verilen işlemci payı ve bellek ile make -j değeri; bellek yetmiyorsa iş sayısını düşürür.
+    # memory_per_job: paketin geçmişinden biliniyorsa -j başına düşen bellek (MB).
+    return max(1, min(int(cpus + 0.5), int(memory_mb // max(1, memory_per_job))))
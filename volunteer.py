@@ -1,8 +1,14 @@
 import os
-import yaml
+import time
 
+from cache import CompilerCache, PackageCache
+from config import kernel_required, sandbox_required
 from Gdocker import Docker
+from history import history
+from image import SETUP_COMMANDS, TOOLCHAIN, ImageCache, WarmImage
 from log import Log
+from topology import MEMORY_PER_JOB, jobs_for
+from workspace import Reaper, Workspace
 
 
 class Volunteer(Docker):
@@ -15,44 +21,116 @@ class Volunteer(Docker):
         self.repo = None
         self.branch = None
         self.kernel_requirement = None
+        self.build_jobs = None
         self.job = params.job
-        
+        self.warm = params.warm
+        self.warm_image = None
+        self.base_image = None
+        self.package_cache = PackageCache(params.cache_size)
+        self.compiler_cache = CompilerCache(params.ccache, params.ccache_total) if params.ccache else None
+        self.workspace_mode = params.workspace
+        self.scratch = params.scratch
+        # tmpfs sayfaları container'ın belleğinden sayıldığı için sınırına eklenir (MB).
+        self.tmpfs_size = params.tmpfs_size if params.workspace == 'tmpfs' else 0
+        self.workspace = None
 
     def get_package_farm(self, response):
         self.package = response['package']
+        self.stage_times = {}
         self.set_name(self.package)
-        self.add_volume('/var/cache/pisi/packages', '/var/cache/pisi/packages')
-        self.add_volume('/var/cache/pisi/archives', '/var/cache/pisi/archives')
+        # pisi önbelleğinin bu derlemeye özel kopyasını bağlıyoruz.
+        cache_paths = self.package_cache.checkout(self.name)
+        self.add_volume(cache_paths['packages'], '/var/cache/pisi/packages')
+        self.add_volume(cache_paths['archives'], '/var/cache/pisi/archives')
         self.add_volume('/tmp/gonullu/build', '/build')
-        self.add_volume('/tmp/varpisi/%s' % self.package, '/var/pisi')
-        self.add_volume('/tmp/gonullu/%s' % self.package, '/root/%s' % self.package)
+        if self.compiler_cache is not None:
+            # aynı paketin önceki derlemelerinden kalan derleyici önbelleği.
+            self.add_volume(self.compiler_cache.checkout(self.package), '/root/.ccache')
+        self.workspace = Workspace(self.package, self.workspace_mode, self.scratch, self.tmpfs_size)
+        self.workspace.create(self)
         self.repo = response['repo']
         self.branch = response['branch']
-        self.set_image(response['dockerimage'])
+        self.base_image = response['dockerimage']
+        if self.warm:
+            # araç zinciri önceden kurulmuş yerel imajı kullanıyoruz, onu çekmeye gerek yok.
+            if self.warm_image is None:
+                self.warm_image = WarmImage(self.get_client(), self.image_ttl)
+            started = time.time()
+            self.set_image(self.warm_image.ensure(response['dockerimage']))
+            self.stage_times['pull'] = time.time() - started
+            self.pull_image = False
+        else:
+            self.set_image(response['dockerimage'])
+            self.pull_image = True
         self.commit_id = response['commit_id']
-        self.kernel_requirement = response['kernel_required']
+        # çekirdek gereksinimi çiftlikten gelmese de yerel listede olabilir.
+        self.kernel_requirement = response['kernel_required'] is True or kernel_required(self.package)
         self.sandbox_requirement = self.sandbox_is_require()
         self.queue_id = response['queue_id']
-        self.preparation(self.kernel_requirement, self.sandbox_requirement, self.package, self.job)
+        # -j verilmediyse container'a ayrılan işlemci ve belleğe göre, paketin geçmişi varsa
+        # önceki derlemelerde -j başına düşen bellek kullanımına göre hesaplıyoruz.
+        prediction = history.predict(self.package)
+        memory_per_job = MEMORY_PER_JOB
+        if prediction and prediction['memory_per_job']:
+            memory_per_job = int(prediction['memory_per_job']) >> 20
+        job = self.job or jobs_for(self.cpu_share or len(self.cpus), self.memory_limit - self.tmpfs_size,
+                                   memory_per_job)
+        self.build_jobs = job
+        self.preparation(self.kernel_requirement, self.sandbox_requirement, self.package, job, self.warm,
+                         self.compiler_cache.size if self.compiler_cache is not None else None)
         self.set_command('/build/build-%s.sh' % self.package, self.queue_id, self.commit_id, self.package)
         self.start()
 
-    def sandbox_is_require(self):
-        config_file = os.path.join(os.path.dirname(__file__), 'config/sandbox-requirement.yml')
-
-        with open(config_file, 'r') as sandbox_file:
-            try:
-                #FIXME! yaml.load(input) is depricated
-                if self.package in yaml.load(sandbox_file, Loader=yaml.FullLoader):
-                    return False
-            except:
-                self.log.error(message='%s dosyası işlenemedi' % config_file)
-                self.log.get_exit()
+    def remove(self, keep_output=False):
+        # container'ı sildikten sonra çalışma dizinlerini bırakıyor, yeni inen paketleri
+        # ortak önbelleğe alma işini bir sonraki paketi beklemeden arka planda yapıyoruz.
+        name = self.name
+        package = self.package
+        Docker.remove(self)
+        if self.workspace is not None:
+            self.workspace.drop(keep_output)
+            self.workspace = None
+        if name is not None:
+            Reaper.get().submit(self.package_cache.checkin, name, package)
+            if self.compiler_cache is not None:
+                self.compiler_cache.checkin(package)
+                Reaper.get().submit(self.compiler_cache.evict)
 
+    def restore(self, entry):
+        # iş günlüğündeki kayıttan durumu geri yükler; container hâlâ duruyorsa True döner.
+        self.package = entry['package']
+        self.package_name = entry['package']
+        self.queue_id = entry['queue_id']
+        self.base_image = entry['response'].get('dockerimage')
+        self.workspace = Workspace(self.package, self.workspace_mode, self.scratch, self.tmpfs_size)
+        if entry['memory_limit']:
+            self.memory_limit = entry['memory_limit']
+        if entry['container_name'] is None:
+            return False
+        # checkin'in derleme sırasında inen dosyaları ortak önbelleğe alabilmesi için.
+        self.package_cache.checkouts[entry['container_name']] = entry['started']
+        if not self.attach(entry['container_id'], entry['container_name']):
+            return False
+        if self.compiler_cache is not None:
+            # container ccache dizinini hâlâ kullanıyor, temizlikte silinmemeli.
+            self.compiler_cache.checkout(self.package)
         return True
 
+    def refresh_image(self):
+        # derlemeler arasında farm imajının güncelliğini arka planda kontrol ettiriyoruz.
+        if self.base_image is not None:
+            ImageCache(self.get_client(), self.image_ttl).refresh_async(self.base_image)
+
+    def sandbox_is_require(self):
+        # liste bir kez okunup frozenset olarak önbellekte tutulur, dosya değişirse yeniden okunur.
+        try:
+            return sandbox_required(self.package)
+        except Exception:
+            self.log.error(message='config/sandbox-requirement.yml dosyası işlenemedi')
+            self.log.get_exit()
+
     @staticmethod
-    def preparation(kernel_require, sandbox_requirement, package, j=5):
+    def preparation(kernel_require, sandbox_requirement, package, j=5, warm=False, ccache=None):
         krn = ' '
         sandbox = ' '
         if kernel_require is True:
@@ -61,21 +139,55 @@ class Volunteer(Docker):
         if sandbox_requirement is False:
             sandbox = ' --ignore-sandbox '
 
+        if warm:
+            # ısıtılmış imajda depolar ve araç zinciri hazır, sadece dbus ve gerekirse çekirdek.
+            setup = 'service dbus start\n'
+            if kernel_require is True:
+                setup += 'pisi it --ignore-safety --ignore-dependency kernel\n'
+        else:
+            setup = SETUP_COMMANDS % (TOOLCHAIN, krn)
+
+        environment = ''
+        ccache_stats = ''
+        if ccache:
+            # pisi'nin ccache yardımcısını açıp önbelleği paket dizinine bağlıyoruz.
+            environment = 'export CCACHE_DIR=/root/.ccache\n'
+            setup += """pisi it --ignore-safety --ignore-dependency ccache
+ccache -M %s
+ccache -z
+sed -i 's/^#\\?\\s*buildhelper\\s*=.*/buildhelper = ccache/' /etc/pisi/pisi.conf
+""" % ccache
+            ccache_stats = 'ccache -s > /root/%s/.ccache-stats 2>&1\n' % package
+
+        # hazırlık adımları ayrı bir kabukta ilk hatada durur; biri başarısız olursa pisi bi hiç
+        # çalıştırılmaz, hazırlık çıktısı .err olarak yazılıp derleme hemen sonlandırılır.
         build_sh = """#!/bin/bash
-service dbus start && pisi cp && update-ca-certificates && pisi ar pisiBeta https://beta.pisilinux.org/pisi-index.xml.xz && pisi it --ignore-safety --ignore-dependency autoconf autogen automake binutils bison flex gawk gc gcc gnuconfig guile libmpc libsigsegv libtool-ltdl libtool lzo m4 make mpfr nasm pkgconfig yacc glibc-devel isl %s
-pisi ar core --ignore-check https://github.com/pisilinux/core/raw/master/pisi-index.xml.xz && pisi ar main --ignore-check https://github.com/pisilinux/main/raw/master/pisi-index.xml.xz --at 2
-pisi ur
-sed -i 's/-j5/-j%d/g' /etc/pisi/pisi.conf
+%secho "setup $(date +%%s.%%N)" > /root/%s/.stages
+(
+set -e
+%s) >/root/%s/.setup.out 2>&1
+SETUP=$?
+if [ $SETUP -ne 0 ]; then
+    echo "setup_failed $(date +%%s.%%N)" >> /root/%s/.stages
+    mv /root/%s/.setup.out /root/%s/$1-$2-$3.err
+    echo $SETUP > /root/%s/$3.bitti
+    exit $SETUP
+fi
+echo "compile $(date +%%s.%%N)" >> /root/%s/.stages
+sed -i 's/-j[0-9]\\+/-j%d/g' /etc/pisi/pisi.conf
 sed -i 's/build_host = localhost/build_host=farmV5/g'   /etc/pisi/pisi.conf
 cd /root
 pisi bi --ignore-safety%s-y $3 1>/root/%s/$1-$2-$3.log 2>/root/%s/$1-$2-$3.err
 STAT=$?
-for s in `ls *.pisi`
+echo "end $(date +%%s.%%N)" >> /root/%s/.stages
+%sfor s in `ls *.pisi`
 do
-    mv $s /root/%s/$1-$2-$s
+    mv $s /root/%s/.$1-$2-$s.part
+    mv /root/%s/.$1-$2-$s.part /root/%s/$1-$2-$s
 done
 echo $STAT >  /root/%s/$3.bitti
-""" % (krn, j, sandbox, package, package, package, package)
+""" % (environment, package, setup, package, package, package, package, package, package, j, sandbox, package, package, package, ccache_stats, package, package, package,
+       package)
 
         build_directory = os.path.join('/', 'tmp', 'gonullu', 'build')
         if not os.path.exists(build_directory):
@@ -0,0 +1,44 @@
+import glob
+import os
+import threading
+
+from failure import FailureDetector
+from log import Log
+
+
+class OutputWatcher(threading.Thread):
+    def __init__(self, farm, package, binary_path, interval=5):
+        # derleme sürerken paketin çıktı dizinini tarayıp biten .pisi dosyalarını hemen gönderir.
+        threading.Thread.__init__(self, name='gonullu-watcher-%s' % package, daemon=True)
+        self.farm = farm
+        self.package = package
+        self.binary_path = binary_path
+        self.interval = interval
+        self.directory = '/tmp/gonullu/%s' % package
+        self.log = Log()
+        self.sent = set()
+        # derleme sürerken hata çıktısını takip edip hatayı erkenden sınıflandırır.
+        self.detector = FailureDetector(self.directory)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.scan()
+            self.detector.scan()
+
+    def scan(self):
+        # derleme betiği .pisi dosyalarını önce gizli bir isimle yazıp sonra yeniden
+        # adlandırdığı için, glob'un bulduğu her .pisi dosyası tamamlanmış demektir.
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.pisi'))):
+            if path in self.sent or self.stopped.is_set():
+                continue
+            # burada tek deneme yapıyoruz; gönderilemeyen dosyalar derleme bitince tekrar denenir.
+            if self.farm.send(path, self.binary_path):
+                self.sent.add(path)
+
+    def stop(self):
+        # taramayı durdurur ve yarım kalan gönderimin bitmesini bekler.
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+        return self.sent
@@ -0,0 +1,315 @@
+import glob
+import os
+import threading
+import time
+import traceback
+
+from journal import journal
+from log import Log
+from metrics import BuildMetrics
+from watcher import OutputWatcher
+
+
+class Worker:
+    def __init__(self, volunteer, farm, log=None, spare=None, admission=None):
+        # tek bir derleme yuvasının (slot) farm -> docker -> farm döngüsü.
+        # spare verilirse boru hattı (pipeline) modunda çalışır: bir derlemenin çıktıları
+        # gönderilirken sıradaki paket spare üzerinde hazırlanıp derlenmeye başlar.
+        self.volunteer = volunteer
+        self.spare = spare
+        self.admission = admission
+        self.farm = farm
+        self.log = log if log else Log()
+        self.running = True
+        self.finisher = None
+        # önceki çalışmadan kalıp bu yuvaya verilen iş günlüğü kayıtları.
+        self.pending = []
+
+    def run(self):
+        # önce yarım kalan işleri bitirir, sonra çiftlikten paket isteyip derleyen ana döngümüz.
+        while self.pending and self.running:
+            entry = self.pending.pop(0)
+            try:
+                self.resume(entry)
+            except Exception:
+                self.log.error('%s paketinin yarım kalan derlemesi sürdürülemedi: %s' % (entry['package'],
+                                                                                     traceback.format_exc()))
+                journal.finish(entry['queue_id'])
+        while self.running:
+            if self.admission is not None and not self.admission.wait_headroom(self.farm.time):
+                # bellek bütçesi dolu; iş alıp bekletmek yerine yer açılınca istiyoruz.
+                continue
+            started = time.time()
+            response = self.farm.get_package()
+            if (response == -1) or (response == -2):
+                if response == -1:
+                    self.farm.idle_wait(message='dir yeni paket bekleniyor.')
+            else:
+                self.process(response, time.time() - started)
+        self.join_finisher()
+
+    def process(self, response, fetch_time=0):
+        # tek bir paketi derleyip çıktılarını çiftliğe gönderen fonksiyonumuz.
+        started = time.time()
+        report = BuildMetrics(response)
+        report.add_stage('fetch', fetch_time)
+        volunteer = self.volunteer
+        if self.admission is not None:
+            # paketin geçmişine göre bellek sınırı belirlenir, bütçe doluysa burada beklenir.
+            limit = self.admission.acquire(volunteer, response['package'], volunteer.tmpfs_size)
+            volunteer.set_memory(limit, self.admission.swap_for(limit))
+        try:
+            watcher = self.build(volunteer, response, report)
+        except Exception:
+            if self.admission is not None:
+                self.admission.release(volunteer)
+            raise
+
+        if self.spare is None:
+            self.finish(volunteer, watcher, response, started, report)
+            return
+
+        # gönderim ve temizlik arka planda sürerken sıradaki paket diğer volunteer ile başlar.
+        # bir önceki gönderim bitmeden yeni bir gönderim başlatmıyoruz, böylece spare
+        # tekrar kullanılmadan önce mutlaka boşalmış oluyor.
+        self.join_finisher()
+        self.finisher = threading.Thread(target=self.finish, args=(volunteer, watcher, response, started, report),
+                                         name='gonullu-finish-%s' % response['package'], daemon=True)
+        self.finisher.start()
+        self.volunteer, self.spare = self.spare, self.volunteer
+
+    def build(self, volunteer, response, report):
+        # container'ı hazırlayıp çalıştırır ve bitmesini bekler.
+        journal.begin(response)
+        volunteer.get_package_farm(response)
+        journal.update(response['queue_id'], stage='building', container_id=volunteer.container_id,
+                       container_name=volunteer.name, memory_limit=volunteer.memory_limit)
+        for stage, seconds in volunteer.stage_times.items():
+            report.add_stage(stage, seconds)
+        return self.wait_build(volunteer, response, report)
+
+    def wait_build(self, volunteer, response, report):
+        # derleme sürerken oluşan .pisi dosyalarını beklemeden göndermeye başlıyoruz.
+        watcher = OutputWatcher(self.farm, response['package'], response['binary_repo_dir'])
+        watcher.start()
+        detected = None
+        sampled = 0
+        # container durana kadar docker wait ile bloklanıyoruz; durduğu an temizlik ve
+        # gönderim başlıyor. cgroup silinmeden en yüksek bellek kullanımını okuyabilmek için
+        # her saniye uyanıyoruz; stats ve ilerleme mesajı farm.time aralıklarla.
+        while volunteer.wait_container(timeout=min(1, self.farm.time)) is None:
+            # container bulundu. İşlem sürüyor.
+            report.sample_peak(volunteer.memory_peak())
+            if time.time() - sampled < self.farm.time:
+                continue
+            sampled = time.time()
+            report.sample(volunteer.stats())
+            if detected is None and watcher.detector.kind is not None:
+                detected = watcher.detector.kind
+                self.log.warning('%s paketinin derlemesinde %s hatası görüldü: %s' %
+                                 (response['package'], detected, watcher.detector.line))
+            self.farm.wait(message='den beri derleme işlemi %s paketi için devam ediyor.' % response['package'],
+                           sleep=False)
+
+        # container durdu. İşlem bitti.
+        self.log.information('%s paketinin container\'ı %d çıkış kodu ile durdu.' % (response['package'],
+                                                                                   volunteer.exit_code))
+        report.exit_code = volunteer.exit_code
+        report.oom_killed = volunteer.oom_killed
+        report.memory_limit = volunteer.memory_limit
+        report.jobs = volunteer.build_jobs
+        if volunteer.oom_killed:
+            self.log.warning('%s paketi %d MB bellek sınırını aştığı için durduruldu.' % (response['package'],
+                                                                                    volunteer.memory_limit))
+        if self.admission is not None:
+            # container durduğu an ayrılan bellek serbest kalır, gönderimi beklemeye gerek yok.
+            self.admission.release(volunteer)
+        journal.update(response['queue_id'], stage='uploading', exit_code=volunteer.exit_code,
+                       oom_killed=volunteer.oom_killed)
+        self.farm.reset_poll()
+        return watcher
+
+    def resume(self, entry):
+        # yeniden başlatmadan önce alınmış bir işi kaldığı aşamadan sürdürür.
+        response = entry['response']
+        volunteer = self.volunteer
+        output_directory = '/tmp/gonullu/%s' % response['package']
+        attached = volunteer.restore(entry)
+
+        if entry['stage'] in ('uploaded', 'reported'):
+            # çıktılar gönderilmiş; gerekirse sonucu bildirip yarım kalan temizliği yapıyoruz.
+            if entry['stage'] == 'uploaded' and not self.report(entry['queue_id'], entry['state']):
+                return
+            self.log.information('%s paketinin yarım kalan temizliği yapılıyor.' % response['package'])
+            self.discard(volunteer, entry)
+            return
+
+        report = BuildMetrics(response)
+        finished = os.path.exists('%s/%s.bitti' % (output_directory, response['package']))
+        # container sonuç yazamadan durmuş ve çıkış kodu kaydedilmişse hata olarak bildirilecek.
+        stopped = entry['stage'] == 'uploading' and entry.get('exit_code') is not None
+        if attached and not finished and volunteer.check() != 0:
+            # container sonuç yazamadan durmuş (ör: makine yeniden başladı), derleme kaybolmuş sayılır.
+            attached = False
+        if attached:
+            # container hâlâ duruyor (çalışıyor ya da bitmiş); bitmesini bekleyip çıktıları gönderiyoruz.
+            self.log.information('%s paketinin %s aşamasında kalan derlemesine yeniden bağlanıldı.' %
+                                 (response['package'], entry['stage']))
+            if self.admission is not None:
+                # container bellek kullanmaya devam ediyor; diğer yuvalar bunu hesaba katmalı.
+                self.admission.reserve(volunteer, volunteer.memory_limit)
+            try:
+                watcher = self.wait_build(volunteer, response, report)
+            except Exception:
+                if self.admission is not None:
+                    self.admission.release(volunteer)
+                raise
+        elif finished or stopped:
+            # container silinmiş ama derleme bitmiş ya da sonuç yazamadan durmuş, çıktıları diskte.
+            self.log.information('%s paketinin gönderilmemiş çıktıları gönderiliyor.' % response['package'])
+            volunteer.exit_code = entry.get('exit_code')
+            volunteer.oom_killed = entry.get('oom_killed', False)
+            report.exit_code = self.read_status(output_directory, response['package'])
+            if report.exit_code is None:
+                report.exit_code = volunteer.exit_code
+            watcher = OutputWatcher(self.farm, response['package'], response['binary_repo_dir'])
+        else:
+            # derlemeden geriye bir şey kalmamış, paketi baştan derliyoruz.
+            self.log.warning('%s paketinin derlemesi kaybolmuş, paket yeniden derlenecek.' % response['package'])
+            self.discard(volunteer, entry)
+            self.process(response)
+            return
+        self.finish(volunteer, watcher, response, entry['started'], report)
+
+    @staticmethod
+    def discard(volunteer, entry):
+        if volunteer.name is not None:
+            volunteer.remove()
+        elif volunteer.workspace is not None:
+            volunteer.workspace.drop()
+            volunteer.workspace = None
+        journal.finish(entry['queue_id'])
+
+    def finish(self, volunteer, watcher, response, started, report):
+        # çıktıları gönderir, sonucu çiftliğe bildirir ve container'ı kaldırır.
+        try:
+            self.upload(volunteer, watcher, response, started, report)
+        except Exception:
+            self.log.error('%s paketinin çıktıları gönderilirken hata oluştu: %s' % (response['package'],
+                                                                                   traceback.format_exc()))
+            # iş kaydı silinmediği için çıktılar bir sonraki açılışta tekrar gönderilir.
+            if volunteer.name is not None:
+                volunteer.remove(keep_output=True)
+        report.finish()
+
+    def upload(self, volunteer, watcher, response, started, report):
+        output_directory = '/tmp/gonullu/%s' % response['package']
+        report.read_build_stages(os.path.join(output_directory, '.stages'))
+        if volunteer.compiler_cache is not None:
+            report.ccache = volunteer.compiler_cache.report(response['package'],
+                                                            os.path.join(output_directory, '.ccache-stats'))
+        report.artifact_bytes = sum(os.path.getsize(file) for file in glob.glob('%s/*.[lpe]*' % output_directory))
+        status = self.read_status(output_directory, response['package'])
+        # .bitti yoksa container pisi bitmeden durmuştur (bellek sınırı, silinen container);
+        # çıkış kodu ne olursa olsun derleme başarısız sayılır.
+        stopped = status is None
+        if stopped:
+            status = volunteer.exit_code if volunteer.exit_code is not None and volunteer.exit_code > 0 else 1
+        failed = status != 0
+        files = None
+        reported = False
+        with report.stage('upload'):
+            # izleyici durmadan hata sınıflandırılmaz, ikisi aynı log dosyalarını okuyor.
+            sent = watcher.stop()
+            if failed:
+                # derleme başarısız: sonucu gönderimi beklemeden hemen bildiriyoruz ve
+                # sadece hatayı gösteren logları gönderiyoruz, böylece yuva çabucak boşalıyor.
+                report.status = status
+                if stopped:
+                    report.failure = watcher.detector.stopped(volunteer.exit_code, volunteer.oom_killed)
+                else:
+                    report.failure = watcher.detector.classify(status)
+                self.log.warning('%s paketi %s hatası ile başarısız oldu, sonuç hemen bildiriliyor: %s' %
+                                 (response['package'], report.failure, watcher.detector.line))
+                # kayıt loglar gönderilene kadar uploading aşamasında kalır, yeniden başlatmada
+                # loglar tekrar gönderilir ama sonuç bir daha bildirilmez.
+                reported = (journal.get(response['queue_id']) or {}).get('reported') or \
+                    self.report(response['queue_id'], status, final=False)
+                files = watcher.detector.relevant_files(report.failure)
+            # yeniden başlatmadan önce gönderilmiş dosyalar da tekrar gönderilmez.
+            sent = sent | journal.sent_files(response['queue_id'])
+            uploaded = self.farm.send_file(response['package'], response['binary_repo_dir'], exclude=sent,
+                                           files=files)
+        if uploaded:
+            if failed:
+                journal.update(response['queue_id'], stage='reported' if reported else 'uploaded', state=status)
+            else:
+                report.status = status
+                journal.update(response['queue_id'], stage='uploaded', state=status)
+                reported = self.report(response['queue_id'], status)
+            with report.stage('cleanup'):
+                volunteer.remove()
+            if reported:
+                journal.finish(response['queue_id'])
+            volunteer.refresh_image()
+            self.log.success(
+                message='derleme işlemi %s paketi için %d saniyede bitti.' % (response['package'],
+                                                                              time.time() - started)
+            )
+            self.log.blank_line()
+            # Tüm işlemler bittikten sonra sadece bu paketin derleme betiğini temizle,
+            # diğer yuvalarda çalışan derlemelerin dosyalarına dokunmuyoruz.
+            try:
+                build_script = '/tmp/gonullu/build/build-%s.sh' % response['package']
+                if os.path.exists(build_script):
+                    os.remove(build_script)
+                self.log.success('%s paketinin geçici dosyaları temizlendi.' % response['package'])
+            except Exception as e:
+                self.log.warning('Temizlik sırasında hata: %s' % str(e))
+        else:
+            # çıktılar gönderilemedi. Yuvayı bir sonraki paket için boşaltıyoruz ama çıktılar ve
+            # iş kaydı (uploading aşamasında) kalıyor; bir sonraki açılışta gönderim tekrar denenir.
+            self.log.error('%s paketinin çıktıları çiftliğe gönderilemedi, bir sonraki açılışta tekrar '
+                           'denenecek.' % response['package'])
+            with report.stage('cleanup'):
+                volunteer.remove(keep_output=True)
+
+    @staticmethod
+    def read_status(output_directory, package):
+        # .bitti dosyasındaki pisi çıkış kodu, derleme bitmemişse None.
+        try:
+            with open('%s/%s.bitti' % (output_directory, package), 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def report(self, queue_id, state, final=True):
+        # derleme sonucunu çiftliğe bildirir; bildirilemezse kayıt bir sonraki açılışta tekrar dener.
+        # final değilse (çıktılar henüz gönderilmeden) sadece bildirildiği kaydedilir.
+        if self.farm.get('updaterunning?id=%s&state=%s' % (queue_id, state), json=False) == -2:
+            return False
+        if final:
+            journal.update(queue_id, stage='reported')
+        else:
+            journal.update(queue_id, reported=True)
+        return True
+
+    def join_finisher(self):
+        if self.finisher is not None:
+            self.finisher.join()
+            self.finisher = None
+
+    def stop(self):
+        # döngünün bir sonraki turda durmasını sağlar.
+        self.running = False
+
+    def detach(self):
+        # container'lara dokunmadan döngüyü durdurur, işler bir sonraki açılışta sürdürülür.
+        self.stop()
+
+    def remove(self):
+        # yuvaya ait çalışan tüm container'ları durdurup siler.
+        self.stop()
+        for volunteer in (self.volunteer, self.spare):
+            if volunteer is not None and volunteer.name is not None:
+                volunteer.remove()
@@ -0,0 +1,110 @@
+import os
+import queue
+import shutil
+import threading
+import uuid
+
+from log import Log
+
+
+class Reaper(threading.Thread):
+    # silme ve önbellek işlemlerini paket alma döngüsünün dışında, arka planda yapan thread'imiz.
+    instance = None
+    lock = threading.Lock()
+
+    def __init__(self):
+        threading.Thread.__init__(self, name='gonullu-reaper', daemon=True)
+        self.jobs = queue.Queue()
+        self.log = Log()
+
+    @classmethod
+    def get(cls):
+        # süreç içinde tek bir reaper çalıştırıyoruz.
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = Reaper()
+                cls.instance.start()
+            return cls.instance
+
+    def submit(self, function, *args):
+        self.jobs.put((function, args))
+
+    def run(self):
+        while True:
+            function, args = self.jobs.get()
+            try:
+                function(*args)
+            except Exception as e:
+                self.log.warning('Arka plan temizliği sırasında hata: %s' % str(e))
+            finally:
+                self.jobs.task_done()
+
+
+class Workspace:
+    # bir derlemenin host üzerindeki çalışma dizinleri. Derleme bitince dizinler aynı dosya
+    # sistemindeki bir çöp dizinine taşınır (O(1) rename) ve asıl silme arka planda yapılır.
+    def __init__(self, package, mode='dir', scratch='/tmp/varpisi', tmpfs_size=0):
+        # tmpfs_size: tmpfs kipinde /var/pisi için MB cinsinden üst sınır, 0 ise sınırsız.
+        self.package = package
+        self.mode = mode
+        self.output = '/tmp/gonullu/%s' % package
+        self.varpisi = os.path.join(scratch, package)
+        self.tmpfs_size = tmpfs_size
+
+    def create(self, docker):
+        # dizinleri hazırlayıp container'a bağlar.
+        os.makedirs(self.output, exist_ok=True)
+        docker.add_volume(self.output, '/root/%s' % self.package)
+        if self.mode == 'tmpfs':
+            # /var/pisi bellekte tutulur, container silinince kendiliğinden kaybolur.
+            options = 'exec,size=%dm' % self.tmpfs_size if self.tmpfs_size else 'exec'
+            docker.add_tmpfs('/var/pisi', options)
+        else:
+            os.makedirs(self.varpisi, exist_ok=True)
+            docker.add_volume(self.varpisi, '/var/pisi')
+
+    def drop(self, keep_output=False):
+        # dizinleri çöpe taşıyıp silme işini reaper'a bırakır. keep_output verilirse
+        # (ör: gönderilemeyen çıktılar bir sonraki açılışta tekrar denenecekse) çıktı dizini kalır.
+        for path in (self.varpisi,) if keep_output else (self.output, self.varpisi):
+            trash = self.trash(path)
+            if trash is not None:
+                Reaper.get().submit(shutil.rmtree, trash, True)
+
+    @staticmethod
+    def trash(path):
+        if not os.path.exists(path):
+            return None
+        trash_directory = os.path.join(os.path.dirname(path), '.trash')
+        os.makedirs(trash_directory, exist_ok=True)
+        target = os.path.join(trash_directory, uuid.uuid4().hex)
+        try:
+            os.rename(path, target)
+        except OSError:
+            # taşınamıyorsa (ör: bağlama noktası) yerinde siliyoruz.
+            target = path
+        return target
+
+    @staticmethod
+    def clean(keep=(), root='/tmp/gonullu'):
+        # önceki çalışmadan kalan çıktı dizinlerini siler; yarım kalan işlerinkine dokunmaz.
+        if not os.path.isdir(root):
+            return
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name == 'build':
+                for script in os.listdir(path):
+                    if not any(script == 'build-%s.sh' % package for package in keep):
+                        os.remove(os.path.join(path, script))
+            elif name not in keep and name != '.trash':
+                trash = Workspace.trash(path)
+                if trash is not None:
+                    Reaper.get().submit(shutil.rmtree, trash, True)
+
+    @staticmethod
+    def purge(*roots):
+        # önceki çalışmalardan kalan çöp dizinlerini arka planda siler.
+        for root in roots:
+            trash_directory = os.path.join(root, '.trash')
+            if os.path.isdir(trash_directory):
+                Reaper.get().submit(shutil.rmtree, trash_directory, True)